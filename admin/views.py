@@ -29,6 +29,12 @@ from drastic.models.group import Group
 from drastic.models.user import User
 from django.conf import settings
 
+from users.credentials import (
+    cached_user,
+    invalidate_credentials,
+    remember_credentials
+)
+
 __copyright__ = "Copyright (C) 2016 University of Maryland"
 __license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
 
@@ -40,11 +46,15 @@ class CassandraAuthentication(BasicAuthentication):
         """
         Authenticate the userid and password against username and password.
         """
+        user, generation = cached_user(username, password)
+        if user is not None:
+            return (user, None)
         user = User.find(username)
         if user is None or not user.is_active():
             raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
         if not user.authenticate(password) and not ldapAuthenticate(username, password):
             raise exceptions.AuthenticationFailed(_('Invalid username/password.'))
+        remember_credentials(user, password, generation)
         return (user, None)
 
 
@@ -203,6 +213,7 @@ def delete_user(request, username):
         return Response(u"User {} doesn't exists".format(username),
                         status=HTTP_404_NOT_FOUND)
     user.delete()
+    invalidate_credentials(username)
     return Response(u"User {} has been deleted".format(username),
                     status=HTTP_200_OK)
 
@@ -210,6 +221,8 @@ def delete_user(request, username):
 def add_user_group(group, ls_users):
     # Check that all users exists
     added, not_added, already_there = group.add_users(ls_users)
+    for name in added:
+        invalidate_credentials(name)
     msg = []
 
     if added:
@@ -236,6 +249,8 @@ def add_user_group(group, ls_users):
 
 def rm_user_group(group, ls_users):
     removed, not_there, not_exist = group.rm_users(ls_users)
+    for name in removed:
+        invalidate_credentials(name)
     msg = []
 
     if removed:
@@ -323,6 +338,7 @@ def modify_user(request, username=""):
         user.update(administrator=request_body['administrator'])
     if 'active' in request_body:
         user.update(active=request_body['active'])
+    invalidate_credentials(username)
     return Response(user.to_dict(), status=HTTP_200_OK)
 
 
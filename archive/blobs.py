@@ -0,0 +1,227 @@
+"""Archive blobs
+
+Chunk-addressed access to the DataObject blobs that hold the content of
+Cassandra resources. Blobs are written in CHUNK_SIZE pieces with sequence
+numbers starting at 0, so a byte offset maps directly to the chunk that holds
+it and a range read only has to fetch the chunks it overlaps. That holds for
+the blobs recorded in BlobInfo, older blobs are read sequentially.
+
+Chunks are encoded with the codecs of archive.chunk_codecs. The deflate
+data of gzip and zip chunks can be sent as gzip members without inflating
+it, the concatenation of the members is a valid gzip stream of the whole
+blob.
+
+Rows of deduplicated blobs reference chunks stored by archive.dedup, they
+are resolved as they are read.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import struct
+import zipfile
+import zlib
+from cStringIO import StringIO
+from itertools import chain
+
+from drastic.models import DataObject
+
+from archive.chunk_codecs import (
+    GzipCodec,
+    ZipCodec,
+    decode_chunk_data
+)
+from archive.dedup import resolve
+from archive.models import BlobInfo
+
+
+CHUNK_SIZE = 1048576
+
+# Number of chunks fetched by a single query, this bounds the memory used to
+# stream a large range
+READ_WINDOW = 4
+
+BLOB_SCHEME = "cassandra://"
+
+# gzip member header: deflate, no flags, no mtime, unknown OS
+GZIP_HEADER = "\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# Largest payload of a stored deflate block
+STORED_BLOCK_SIZE = 65535
+
+
+def blob_id(url):
+    """Return the DataObject uuid of a cassandra:// url, None for references"""
+    if url and url.startswith(BLOB_SCHEME):
+        return url[len(BLOB_SCHEME):]
+    return None
+
+
+def blob_checksum(uuid):
+    """Return the hex SHA-256 of a blob recorded at ingest, None if it isn't
+    known"""
+    if uuid is None:
+        return None
+    info = BlobInfo.objects.filter(uuid=uuid).first()
+    return info.sha256 if info is not None else None
+
+
+def chunk_span(start, stop, chunk_size=CHUNK_SIZE):
+    """Return the first and last sequence numbers covering [start, stop)"""
+    return start // chunk_size, (stop - 1) // chunk_size
+
+
+def decode_chunk(entry):
+    """Return the content stored in a DataObject row"""
+    return decode_chunk_data(entry.blob, entry.compressed)
+
+
+def iter_entries(uuid, first=0, last=None, raw=False):
+    """Yield the DataObject rows first to last (inclusive) of a blob,
+    READ_WINDOW rows per query. Without last the rows are read until a
+    window comes back incomplete. Deduplicated chunks are resolved unless
+    raw is set"""
+    while last is None or first <= last:
+        window_end = first + READ_WINDOW - 1
+        if last is not None:
+            window_end = min(window_end, last)
+        entries = DataObject.objects.filter(uuid=uuid,
+                                            sequence_number__gte=first,
+                                            sequence_number__lte=window_end)
+        # Deduplicated chunks are fetched for the whole window at once
+        entries = list(entries.limit(None))
+        if not raw:
+            entries = resolve(entries)
+        for entry in entries:
+            yield entry
+        if last is None and len(entries) < READ_WINDOW:
+            return
+        first = window_end + 1
+
+
+def iter_chunks(uuid, first, last):
+    """Yield (sequence number, content) for the chunks first to last
+    (inclusive) of a blob, READ_WINDOW chunks per query"""
+    for entry in iter_entries(uuid, first, last):
+        yield entry.sequence_number, decode_chunk(entry)
+
+
+def iter_content(uuid):
+    """Yield the content of a whole blob chunk by chunk"""
+    for entry in iter_entries(uuid):
+        yield decode_chunk(entry)
+
+
+def iter_range(uuid, size, start, stop, chunk_size=CHUNK_SIZE):
+    """Yield the content of a blob between start (inclusive) and stop
+    (exclusive), only reading the chunks that overlap the range.
+
+    Only the blobs with a BlobInfo row were written with regular chunks.
+    Blobs written before (by the agent uploader for instance) may have
+    chunks of any size, they are scanned sequentially from their start. A
+    chunk of unexpected size also falls back to the scan."""
+    stop = min(stop, size)
+    if start >= stop:
+        return
+    if not BlobInfo.objects.filter(uuid=uuid).only(["uuid"]).first():
+        for piece in _scan_range(uuid, start, stop):
+            yield piece
+        return
+    first, last = chunk_span(start, stop, chunk_size)
+    last_seq = (size - 1) // chunk_size
+    for seq, data in iter_chunks(uuid, first, last):
+        offset = seq * chunk_size
+        expected = chunk_size if seq < last_seq else size - offset
+        if len(data) != expected:
+            # Irregular geometry, offsets can't be computed
+            for piece in _scan_range(uuid, start, stop):
+                yield piece
+            return
+        lo = max(start - offset, 0)
+        hi = min(stop - offset, len(data))
+        if lo < hi:
+            yield data[lo:hi]
+        # A chunk has been yielded, restart the range after it so that the
+        # fallback never sends the same bytes twice
+        start = max(start, offset + len(data))
+
+
+def _scan_range(uuid, start, stop):
+    """Sequential version of iter_range for blobs with irregular chunks"""
+    offset = 0
+    for _, data in iter_chunks(uuid, 0, (stop - 1)):
+        end = offset + len(data)
+        if end > start:
+            lo = max(start - offset, 0)
+            hi = min(stop - offset, len(data))
+            if lo < hi:
+                yield data[lo:hi]
+        offset = end
+        if offset >= stop:
+            return
+
+
+def _deflate_stored(data):
+    """Frame data as stored (uncompressed) deflate blocks"""
+    blocks = []
+    for idx in range(0, len(data), STORED_BLOCK_SIZE) or [0]:
+        piece = data[idx:idx + STORED_BLOCK_SIZE]
+        final = 1 if idx + STORED_BLOCK_SIZE >= len(data) else 0
+        blocks.append(struct.pack("<BHH", final, len(piece),
+                                  len(piece) ^ 0xffff))
+        blocks.append(piece)
+    return ''.join(blocks)
+
+
+def is_deflated(entry):
+    """Return True if a DataObject row holds deflate data"""
+    return bool(entry.compressed and entry.blob and
+                entry.blob.startswith((GzipCodec.magic, ZipCodec.magic)))
+
+
+def gzip_member(entry):
+    """Return a DataObject row as a gzip member. gzip chunks are sent as
+    they are, the deflate data of zip chunks is copied with its crc and
+    size, other chunks are sent as stored blocks"""
+    if is_deflated(entry) and entry.blob.startswith(GzipCodec.magic):
+        return entry.blob
+    if is_deflated(entry):
+        z = zipfile.ZipFile(StringIO(entry.blob), "r")
+        info = z.getinfo("data")
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            # The local header is followed by the name and the extra field,
+            # their lengths may differ from the central directory
+            offset = info.header_offset
+            name_len, extra_len = struct.unpack(
+                "<HH", entry.blob[offset + 26:offset + 30])
+            start = offset + 30 + name_len + extra_len
+            deflated = entry.blob[start:start + info.compress_size]
+            return (GZIP_HEADER + deflated +
+                    struct.pack("<II", info.CRC & 0xffffffff,
+                                info.file_size & 0xffffffff))
+    data = decode_chunk(entry)
+    return (GZIP_HEADER + _deflate_stored(data) +
+            struct.pack("<II", zlib.crc32(data) & 0xffffffff,
+                        len(data) & 0xffffffff))
+
+
+def gzip_encoding(uuid):
+    """Return the encoding negotiate_gzip sends a blob with, only its first
+    chunk is read"""
+    first = next(iter_entries(uuid, 0, 0), None)
+    if first is not None and is_deflated(first):
+        return "gzip"
+    return None
+
+
+def negotiate_gzip(uuid):
+    """Return (encoding, iterator) to send a whole blob. Blobs whose first
+    chunk holds deflate data are sent as a gzip stream ("gzip"), the others
+    are decoded (None)"""
+    entries = iter_entries(uuid)
+    first = next(entries, None)
+    if first is None:
+        return None, iter([])
+    entries = chain([first], entries)
+    if is_deflated(first):
+        return "gzip", (gzip_member(entry) for entry in entries)
+    return None, (decode_chunk(entry) for entry in entries)
@@ -0,0 +1,247 @@
+"""Archive chunk codecs
+
+Codecs used to encode the chunks of a blob. DataObject rows only have a
+compressed flag, so every encoded chunk starts with the magic number of its
+format: a chunk is decoded without knowing which codec wrote it, and blobs
+written before the registry existed (zip files) or with another codec
+setting stay readable. The codec used for a blob is also recorded in its
+BlobInfo row.
+
+"none" stores the content as is (compressed flag unset). "gzip" is a single
+zlib pass wrapped in a gzip header, the stored chunks can then be sent to
+clients as they are (see archive.blobs.gzip_member). "zip" is the format
+used by drastic and the default, drastic's own tools only read that one.
+Codecs depending on modules which aren't installed are left out of the
+registry.
+
+Content which is already compressed (media, archives) is stored with "none"
+rather than the default codec, see compressible().
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import bz2
+import zipfile
+import zlib
+from collections import OrderedDict
+from cStringIO import StringIO
+
+try:
+    from backports import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Codec(object):
+    """Base class of the chunk codecs"""
+
+    # Identifier recorded in BlobInfo and used in the settings
+    name = None
+    # Prefix of every encoded chunk
+    magic = None
+    # Level used when none is given, None for codecs without levels
+    default_level = None
+
+    def encode(self, data, level=None):
+        """Return the encoded version of data"""
+        raise NotImplementedError()
+
+    def decode(self, data):
+        """Return the content of an encoded chunk"""
+        raise NotImplementedError()
+
+    def level(self, level):
+        return self.default_level if level is None else level
+
+
+class NoneCodec(Codec):
+    """Content stored as is"""
+    name = "none"
+
+    def encode(self, data, level=None):
+        return data
+
+    def decode(self, data):
+        return data
+
+
+class ZipCodec(Codec):
+    """Zip file with a single deflated member, written by drastic"""
+    name = "zip"
+    magic = "PK\x03\x04"
+
+    def encode(self, data, level=None):
+        f = StringIO()
+        z = zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED)
+        z.writestr("data", data)
+        z.close()
+        return f.getvalue()
+
+    def decode(self, data):
+        z = zipfile.ZipFile(StringIO(data), "r")
+        content = z.read("data")
+        z.close()
+        return content
+
+
+class GzipCodec(Codec):
+    """Deflate stream with a gzip header and trailer, in one zlib pass"""
+    name = "gzip"
+    magic = "\x1f\x8b"
+    default_level = 6
+
+    def encode(self, data, level=None):
+        # A window of 16 + 15 bits asks zlib for the gzip wrapper
+        compressor = zlib.compressobj(self.level(level), zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def decode(self, data):
+        return zlib.decompress(data, 31)
+
+
+class Bz2Codec(Codec):
+    name = "bz2"
+    magic = "BZh"
+    default_level = 9
+
+    def encode(self, data, level=None):
+        return bz2.compress(data, self.level(level))
+
+    def decode(self, data):
+        return bz2.decompress(data)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+    magic = "\xfd7zXZ\x00"
+    default_level = 6
+
+    def encode(self, data, level=None):
+        return lzma.compress(data, preset=self.level(level))
+
+    def decode(self, data):
+        return lzma.decompress(data)
+
+
+class Lz4Codec(Codec):
+    name = "lz4"
+    magic = "\x04\x22\x4d\x18"
+    default_level = 0
+
+    def encode(self, data, level=None):
+        return lz4_frame.compress(data, compression_level=self.level(level))
+
+    def decode(self, data):
+        return lz4_frame.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    magic = "\x28\xb5\x2f\xfd"
+    default_level = 3
+
+    def encode(self, data, level=None):
+        compressor = zstandard.ZstdCompressor(level=self.level(level))
+        return compressor.compress(data)
+
+    def decode(self, data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+# Mimetypes (or prefixes) of formats which are already compressed
+INCOMPRESSIBLE_TYPES = (
+    "application/gzip",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-gzip",
+    "application/x-rar-compressed",
+    "application/x-xz",
+    "application/zip",
+    "audio/aac",
+    "audio/mp4",
+    "audio/mpeg",
+    "audio/ogg",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "video/",
+)
+# Bytes of the first chunk compressed to estimate the ratio of the others
+SAMPLE_SIZE = 65536
+# Content is compressed if the sample shrinks to less than this ratio
+MAX_RATIO = 0.9
+
+
+CODECS = OrderedDict()
+
+
+def register(codec):
+    """Add a codec to the registry"""
+    CODECS[codec.name] = codec
+
+
+register(NoneCodec())
+register(ZipCodec())
+register(GzipCodec())
+register(Bz2Codec())
+if lzma is not None:
+    register(LzmaCodec())
+if lz4_frame is not None:
+    register(Lz4Codec())
+if zstandard is not None:
+    register(ZstdCodec())
+
+
+def get_codec(name):
+    """Return a registered codec, ValueError if it's unknown"""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(u"Unknown chunk codec '{}'".format(name))
+
+
+def detect_codec(data):
+    """Return the codec which encoded a compressed chunk"""
+    for codec in CODECS.values():
+        if codec.magic and data.startswith(codec.magic):
+            return codec
+    raise ValueError("Unknown chunk format")
+
+
+def encode_chunk(name, data, level=None):
+    """Encode a chunk with a codec, return (compressed flag, blob)"""
+    codec = get_codec(name)
+    return codec.magic is not None, codec.encode(data, level)
+
+
+def decode_chunk_data(data, compressed):
+    """Return the content of a chunk stored with the given compressed flag"""
+    if not data:
+        return ''
+    if not compressed:
+        return data
+    return detect_codec(data).decode(data)
+
+
+def compressible(mimetype, data):
+    """Decide if content is worth compressing from its mimetype and from a
+    fast trial compression of a sample of its first chunk"""
+    mimetype = (mimetype or "").split(";")[0].strip().lower()
+    if mimetype.startswith(INCOMPRESSIBLE_TYPES):
+        return False
+    sample = data[:SAMPLE_SIZE]
+    if not sample:
+        return True
+    return len(zlib.compress(sample, 1)) < MAX_RATIO * len(sample)
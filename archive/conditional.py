@@ -0,0 +1,120 @@
+"""Archive conditional requests
+
+Validators for the content of resources. The ETag is built from the blob id
+and the modification time of the resource, both are known from the resource
+itself so a conditional request can be answered with 304 Not Modified before
+any chunk is fetched.
+
+Content sent with a Content-Encoding, or wrapped in a CDMI JSON body, gets
+the weak version of the ETag, a weak comparison still matches it for
+If-None-Match.
+
+The Digest header gives the SHA-256 recorded when the content was written,
+so clients can check a transfer without downloading the object again.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import base64
+import binascii
+import calendar
+import hashlib
+import re
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from archive.blobs import CHUNK_SIZE, blob_checksum, blob_id
+
+
+def modified_timestamp(resource):
+    """Return the modification time of a resource as a POSIX timestamp in
+    milliseconds, the creation time if it has never been modified"""
+    ts = resource.get_modified_ts() or resource.get_create_ts()
+    if ts is None:
+        return 0
+    return calendar.timegm(ts.utctimetuple()) * 1000 + ts.microsecond // 1000
+
+
+def resource_etag(resource):
+    """Return a strong ETag for the content of a resource. The blob id
+    changes when new content is written and the timestamp when the resource
+    is updated in place"""
+    version = blob_id(resource.url)
+    if version is None:
+        # References have no blob, the url is their content
+        version = hashlib.md5(resource.url.encode("utf-8")).hexdigest()
+    return '"{}-{}"'.format(version, modified_timestamp(resource))
+
+
+def add_validators(response, resource, encoding=None, weak=False):
+    """Set the ETag and Last-Modified headers of a response, encoding is
+    the Content-Encoding of its content if any. weak is set when the response
+    sends another representation of the content"""
+    etag = resource_etag(resource)
+    if encoding or weak:
+        etag = "W/" + etag
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified_timestamp(resource) // 1000)
+    return response
+
+
+def add_digest(response, resource):
+    """Set the Digest header (RFC 3230) of a response sending the whole
+    content of a resource without Content-Encoding, when its checksum has
+    been recorded"""
+    checksum = blob_checksum(blob_id(resource.url))
+    if checksum:
+        response["Digest"] = "SHA-256={}".format(
+            base64.b64encode(binascii.unhexlify(checksum)))
+    return response
+
+
+def accepts_gzip(request):
+    """Return True if the Accept-Encoding header of a request allows gzip"""
+    accepted = {}
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = coding.strip().lower().partition(";")
+        match = re.search(r"q=([0-9.]+)", params)
+        try:
+            accepted[coding.strip()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            accepted[coding.strip()] = 0.0
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in accepted:
+            return accepted[coding] > 0
+    return False
+
+
+def gzip_passthrough(request, size):
+    """Return True if a blob of the given size may be sent gzip encoded.
+    Blobs larger than a chunk are sent as several gzip members and some
+    decoders stop after the first one, so this is only done when
+    GZIP_MULTI_MEMBER is set"""
+    if size > CHUNK_SIZE and not getattr(settings, "GZIP_MULTI_MEMBER", False):
+        return False
+    return accepts_gzip(request)
+
+
+def set_encoding(response, encoding):
+    """Set the Content-Encoding of a response, the content sent depends on
+    the Accept-Encoding header of the request"""
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def not_modified(request, resource):
+    """Evaluate the conditional headers of a request against a resource.
+    Return a 304 (or 412 for a failed If-Match) response when the request
+    shouldn't be served, None otherwise"""
+    response = get_conditional_response(
+        request,
+        etag=resource_etag(resource),
+        last_modified=modified_timestamp(resource) // 1000)
+    if response is not None:
+        add_validators(response, resource)
+    return response
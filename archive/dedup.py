@@ -0,0 +1,127 @@
+"""Archive chunk deduplication
+
+With CHUNK_DEDUP set the chunks of new blobs are stored once per distinct
+content. The content goes to ChunkContent, keyed by the SHA-256 of the
+decoded data, and the DataObject row of the blob only holds a reference:
+REF_MAGIC followed by the hex digest. A chunk whose digest is already
+stored isn't encoded nor written again. Rows are resolved when they are
+read by archive.blobs.iter_entries, so the readers don't see references.
+Blobs written without deduplication get references too the first time
+they are copied, see archive.operations.share_blob.
+
+ChunkRefs counts the rows referencing each content. Counters are
+incremented when a reference is written and decremented by release_blob
+when the write paths replace or delete a blob. Collections deleted by
+drastic don't go through release_blob, the blob garbage collection finds
+the contents no blob references and fixes their counters before deleting
+them.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import hashlib
+
+from drastic.models import DataObject
+
+from archive.chunk_codecs import encode_chunk
+from archive.models import BlobInfo, ChunkContent, ChunkRefs
+
+
+# Prefix of a DataObject row referencing a ChunkContent, it can't be
+# mistaken for the magic number of a codec
+REF_MAGIC = "\x00DRASTIC-REF\x00"
+
+
+def chunk_hash(data):
+    """Return the key of a chunk content"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_ref(digest):
+    return REF_MAGIC + digest
+
+
+def ref_hash(data):
+    """Return the digest referenced by the content of a DataObject row, None
+    if the row holds the chunk itself"""
+    if data and data.startswith(REF_MAGIC):
+        return data[len(REF_MAGIC):]
+    return None
+
+
+def add_ref(digest):
+    """Count a new reference to a chunk content"""
+    counter = ChunkRefs(hash=digest)
+    counter.refs += 1
+    counter.save()
+
+
+def store_chunk(codec, data, level=None):
+    """Store a chunk content unless it's already there and return
+    (compressed, blob) for the DataObject row referencing it"""
+    digest = chunk_hash(data)
+    # The reference is counted before the content is looked up, the garbage
+    # collection doesn't delete a content with references
+    add_ref(digest)
+    existing = (ChunkContent.objects.filter(hash=digest)
+                .only(["hash"]).first())
+    if existing is None:
+        compressed, blob = encode_chunk(codec, data, level)
+        ChunkContent.create(hash=digest, blob=blob, compressed=compressed)
+    return False, make_ref(digest)
+
+
+def resolve(entries):
+    """Replace the references of a list of DataObject rows by the chunks
+    they point to, the contents are fetched with a single query"""
+    digests = set()
+    for entry in entries:
+        digest = ref_hash(entry.blob)
+        if digest:
+            digests.add(digest)
+    if not digests:
+        return entries
+    contents = {}
+    for content in ChunkContent.objects.filter(hash__in=list(digests)):
+        contents[content.hash] = content
+    for entry in entries:
+        digest = ref_hash(entry.blob)
+        if digest is None:
+            continue
+        content = contents.get(digest)
+        if content is None:
+            raise IOError(u"Missing chunk content {}".format(digest))
+        # The rows are only read, they are never saved back
+        entry.blob = content.blob
+        entry.compressed = content.compressed
+    return entries
+
+
+def release_blob(uuid):
+    """Decrement the counters of the contents referenced by a blob which is
+    going to be deleted. Blobs written without deduplication and references
+    (uuid None) are ignored"""
+    if uuid is None:
+        return
+    info = BlobInfo.objects.filter(uuid=uuid).first()
+    if info is None or not info.dedup:
+        return
+    release_rows(uuid)
+
+
+def release_rows(uuid, first=0, last=None):
+    """Decrement the counters of the contents referenced by the rows of a
+    blob, the rows from sequence number first to last (excluded) if
+    given"""
+    entries = DataObject.objects.filter(uuid=uuid)
+    if first:
+        entries = entries.filter(sequence_number__gte=first)
+    if last is not None:
+        entries = entries.filter(sequence_number__lt=last)
+    for entry in entries.limit(None):
+        digest = ref_hash(entry.blob)
+        if digest:
+            counter = ChunkRefs(hash=digest)
+            counter.refs -= 1
+            counter.save()
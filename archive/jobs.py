@@ -0,0 +1,135 @@
+"""Archive jobs
+
+Operations that may take minutes (recursive copies, moves and deletes) run
+as background jobs so the request returns 202 Accepted at once. A job is a
+row of the Job table naming a function registered with @job and its
+arguments, it's run by a pool of JOB_THREADS threads in the worker which
+submitted it.
+
+While a job runs, the collection or resource it works on has its
+cdmi_completionStatus metadata set to "Processing" and cdmi_percentComplete
+to its progress, which is what CDMI clients poll. Both are set to "Complete"
+and 100 when the job is done, an error is kept in the Job row and the
+status becomes "Error".
+
+Jobs registered with status=False (maintenance of a blob for instance)
+don't touch the metadata of their path.
+
+Jobs have to be idempotent: the ones left unfinished by a worker which died
+are run again by "manage.py resume_jobs".
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+
+from django.conf import settings
+
+from archive.lookup import find_collection, find_resource, forget
+from archive.models import Job
+
+
+PROCESSING = "Processing"
+COMPLETE = "Complete"
+ERROR = "Error"
+
+# Functions of the job kinds
+JOBS = {}
+# Kinds which don't report their status in the metadata of their path
+QUIET = set()
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, "JOB_THREADS", 2))
+
+
+def job(kind, status=True):
+    """Register a function as the job kind, it's called with the Job and
+    the keyword arguments given to submit(). With status False the
+    completion metadata of the path isn't updated"""
+    def register(func):
+        JOBS[kind] = func
+        if not status:
+            QUIET.add(kind)
+        return func
+    return register
+
+
+def set_status(kind, path, status, percent):
+    """Set the completion metadata of the collection or resource at path"""
+    if kind in QUIET:
+        return
+    obj = find_collection(path) or find_resource(path)
+    if obj is None:
+        return
+    metadata = obj.get_metadata()
+    metadata["cdmi_completionStatus"] = status
+    metadata["cdmi_percentComplete"] = str(percent)
+    obj.update(metadata=metadata)
+    forget(path)
+
+
+def submit(kind, path, owner, **params):
+    """Record a job and start it in the background, return the Job"""
+    if kind not in JOBS:
+        raise ValueError(u"Unknown job kind '{}'".format(kind))
+    now = datetime.utcnow()
+    new = Job.create(id=uuid4().hex,
+                     kind=kind,
+                     path=path,
+                     owner=owner,
+                     params=json.dumps(params),
+                     status=PROCESSING,
+                     percent=0,
+                     created=now,
+                     updated=now)
+    set_status(kind, path, PROCESSING, 0)
+    _executor.submit(run, new.id)
+    return new
+
+
+def progress(job, percent):
+    """Report the progress of a job, in percents"""
+    percent = min(int(percent), 99)
+    if percent == job.percent:
+        return
+    job.percent = percent
+    job.updated = datetime.utcnow()
+    job.save()
+    set_status(job.kind, job.path, PROCESSING, percent)
+
+
+def run(job_id):
+    """Run a job to its end and record its result"""
+    current = Job.objects.filter(id=job_id).first()
+    if current is None or current.status != PROCESSING:
+        return
+    try:
+        JOBS[current.kind](current, **json.loads(current.params))
+    except Exception as e:
+        logging.getLogger("drastic").exception(
+            u"Job {} ({} on '{}') failed".format(current.id, current.kind, current.path))
+        current.status = ERROR
+        current.error = unicode(e)
+    else:
+        current.status = COMPLETE
+        current.percent = 100
+    current.updated = datetime.utcnow()
+    current.save()
+    set_status(current.kind, current.path, current.status, current.percent)
+
+
+def unfinished_jobs(older_than=None):
+    """Return the jobs still processing, not updated since older_than if
+    given"""
+    jobs = []
+    for current in Job.objects.limit(None):
+        if current.status != PROCESSING:
+            continue
+        if older_than is not None and current.updated > older_than:
+            continue
+        jobs.append(current)
+    return jobs
@@ -0,0 +1,363 @@
+"""Archive lookup
+
+Caches for collections and resources.
+
+Each request has its own identity map, every path or uuid is fetched from
+Cassandra at most once per request and later lookups get the same object.
+Lookups that don't depend on each other (a resource and its parent for
+instance) can be prefetched together, they are then issued concurrently.
+The map is created and dropped by archive.middleware.LookupMiddleware, code
+running outside of a request goes straight to the database.
+
+Paths are also kept across requests in a bounded LRU cache per worker. Each
+write publishes the path it modified on an invalidation channel carried by
+the default Django cache: a sequence number and one key per invalidation.
+At the start of a request a worker applies the invalidations published
+since its previous request, and drops its whole cache if it can't tell what
+it missed. The channel needs a cache shared by the workers, with the local
+memory backend the LRU cache is disabled.
+
+Collections being deleted in the background and everything below them are
+not found, see archive.tombstone.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from drastic.models import (
+    Collection,
+    Resource
+)
+
+from archive.tombstone import is_buried
+
+
+# Pool used to issue independent lookups concurrently
+LOOKUP_THREADS = 4
+
+# Keys of the invalidation channel in the default cache
+SEQUENCE_KEY = "lookup_invalidation_seq"
+INVALIDATION_KEY = "lookup_invalidation_{}"
+# Number of missed invalidations above which the whole cache is dropped
+# rather than replayed
+MAX_REPLAY = 1000
+
+_executor = ThreadPoolExecutor(max_workers=LOOKUP_THREADS)
+_local = threading.local()
+
+COLLECTION = "collection"
+RESOURCE = "resource"
+
+FINDERS = {
+    COLLECTION: Collection.find,
+    RESOURCE: Resource.find,
+}
+UUID_FINDERS = {
+    COLLECTION: Collection.find_by_uuid,
+    RESOURCE: Resource.find_by_uuid,
+}
+
+
+def _norm(path):
+    return path.rstrip('/') or '/'
+
+
+def _parent(path):
+    """Return the parent of a normalised path, None for the root"""
+    if path == '/':
+        return None
+    return path.rsplit('/', 1)[0] or '/'
+
+
+class LRUCache(object):
+    """Thread safe mapping of (kind, path) to objects, bounded in size and
+    in age. The keys are indexed by path in a tree of the cached paths and
+    their ancestors, so invalidating a path only visits what is below it"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Path -> keys cached for it
+        self.keys = {}
+        # Path -> paths of its children leading to cached keys
+        self.tree = {}
+        self.lock = threading.Lock()
+
+    def _index(self, key):
+        path = _norm(key[1])
+        self.keys.setdefault(path, set()).add(key)
+        parent = _parent(path)
+        while parent is not None:
+            children = self.tree.setdefault(parent, set())
+            if path in children:
+                break
+            children.add(path)
+            path, parent = parent, _parent(parent)
+
+    def _prune(self, path):
+        """Remove the paths which don't lead to any key anymore"""
+        while path is not None and path not in self.keys and not self.tree.get(path):
+            self.tree.pop(path, None)
+            parent = _parent(path)
+            if parent is not None and parent in self.tree:
+                self.tree[parent].discard(path)
+            path = parent
+
+    def _unindex(self, key):
+        path = _norm(key[1])
+        keys = self.keys.get(path)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys[path]
+        self._prune(path)
+
+    def get(self, key):
+        """Return (True, object) for a fresh entry, (False, None) otherwise.
+        Objects may be None for paths known not to exist"""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return False, None
+            if entry[0] < time.time():
+                self._unindex(key)
+                return False, None
+            # Move the entry to the most recently used end
+            self.entries[key] = entry
+            return True, entry[1]
+
+    def set(self, key, obj):
+        with self.lock:
+            if self.entries.pop(key, None) is None:
+                self._index(key)
+            self.entries[key] = (time.time() + self.ttl, obj)
+            while len(self.entries) > self.size:
+                old, _ = self.entries.popitem(last=False)
+                self._unindex(old)
+
+    def invalidate(self, path):
+        """Drop a path and everything below it, ACLs are inherited so a
+        change on a collection may affect its descendants"""
+        path = _norm(path)
+        with self.lock:
+            stack = [path]
+            while stack:
+                current = stack.pop()
+                for key in self.keys.pop(current, ()):
+                    del self.entries[key]
+                stack.extend(self.tree.pop(current, ()))
+            parent = _parent(path)
+            if parent is not None and parent in self.tree:
+                self.tree[parent].discard(path)
+                self._prune(parent)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys.clear()
+            self.tree.clear()
+
+
+def _shared_cache():
+    """Create the cross-request cache if the invalidation channel can reach
+    the other workers"""
+    size = getattr(settings, "LOOKUP_CACHE_SIZE", 0)
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if not size:
+        return None
+    if backend.endswith("LocMemCache"):
+        logging.getLogger("drastic").info(
+            "Lookup cache disabled, the default cache isn't shared by the workers")
+        return None
+    return LRUCache(size, getattr(settings, "LOOKUP_CACHE_TTL", 300))
+
+
+_shared = _shared_cache()
+# Last invalidation applied by this worker, the request threads of a worker
+# apply the invalidations one at a time and the sequence number only moves
+# once they have been applied
+_applied = {"seq": None}
+_sync_lock = threading.Lock()
+
+
+def _sync():
+    """Apply the invalidations published by the other workers"""
+    with _sync_lock:
+        current = cache.get(SEQUENCE_KEY, 0)
+        applied = _applied["seq"]
+        if applied is not None and current != applied:
+            _replay(applied, current)
+        _applied["seq"] = current
+
+
+def _replay(applied, current):
+    """Invalidate the paths published between two sequence numbers"""
+    if current < applied or current - applied > MAX_REPLAY:
+        # The channel has been reset or we are too far behind
+        _shared.clear()
+        return
+    keys = [INVALIDATION_KEY.format(seq)
+            for seq in range(applied + 1, current + 1)]
+    paths = cache.get_many(keys)
+    if len(paths) != len(keys):
+        # Some invalidations have been evicted, we can't tell which paths
+        # are stale
+        _shared.clear()
+        return
+    for path in paths.values():
+        _shared.invalidate(path)
+
+
+def _publish(path):
+    """Invalidate a path in this worker and tell the other workers"""
+    _shared.invalidate(path)
+    cache.add(SEQUENCE_KEY, 0, None)
+    seq = cache.incr(SEQUENCE_KEY)
+    cache.set(INVALIDATION_KEY.format(seq), path,
+              getattr(settings, "LOOKUP_CACHE_TTL", 300))
+
+
+def begin_request():
+    """Start a new identity map for the current thread"""
+    _local.objects = {}
+    if _shared is not None:
+        _sync()
+
+
+def end_request():
+    """Drop the identity map of the current thread"""
+    _local.objects = None
+
+
+def _objects():
+    return getattr(_local, "objects", None)
+
+
+def _store(key, obj):
+    """Add an object to the identity map and to the cross-request cache"""
+    objects = _objects()
+    if objects is not None:
+        objects[key] = obj
+        if obj is not None:
+            objects[(key[0], "uuid", obj.uuid)] = obj
+    if _shared is not None and key[1] != "uuid":
+        _shared.set(key, obj)
+
+
+def remember(obj):
+    """Add an object which has just been created to the caches"""
+    if obj is None:
+        return
+    kind = COLLECTION if isinstance(obj, Collection) else RESOURCE
+    if _shared is not None:
+        # Other workers may have cached that the path didn't exist
+        _publish(obj.path)
+    _store((kind, obj.path), obj)
+
+
+def forget(path):
+    """Remove a path from the caches after it has been modified or deleted,
+    the paths below it are removed from the cross-request cache as well"""
+    objects = _objects()
+    if objects is not None:
+        for kind in FINDERS:
+            obj = objects.pop((kind, path), None)
+            if obj is not None:
+                objects.pop((kind, "uuid", obj.uuid), None)
+    if _shared is not None:
+        _publish(path)
+
+
+def _find(kind, path):
+    key = (kind, path)
+    objects = _objects()
+    if objects is not None and key in objects:
+        return objects[key]
+    if _shared is not None:
+        found, obj = _shared.get(key)
+        if found:
+            _store(key, obj)
+            return obj
+    obj = FINDERS[kind](path)
+    _store(key, obj)
+    return obj
+
+
+def _find_by_uuid(kind, uuid):
+    objects = _objects()
+    if objects is None:
+        return UUID_FINDERS[kind](uuid)
+    key = (kind, "uuid", uuid)
+    if key not in objects:
+        obj = UUID_FINDERS[kind](uuid)
+        objects[key] = obj
+        if obj is not None:
+            _store((kind, obj.path), obj)
+    return objects[key]
+
+
+def _visible(obj):
+    """Hide the objects of a tree being deleted"""
+    if obj is None or is_buried(obj.path):
+        return None
+    return obj
+
+
+def find_collection(path):
+    """Return the collection at path, None if it doesn't exist"""
+    return _visible(_find(COLLECTION, path))
+
+
+def find_resource(path):
+    """Return the resource at path, None if it doesn't exist"""
+    return _visible(_find(RESOURCE, path))
+
+
+def find_collection_by_uuid(uuid):
+    """Return the collection with the given uuid, None if it doesn't exist"""
+    return _visible(_find_by_uuid(COLLECTION, uuid))
+
+
+def find_resource_by_uuid(uuid):
+    """Return the resource with the given uuid, None if it doesn't exist"""
+    return _visible(_find_by_uuid(RESOURCE, uuid))
+
+
+def prefetch(collections=(), resources=()):
+    """Fetch several paths concurrently and add them to the caches, so that
+    the following find_collection/find_resource calls don't wait for
+    Cassandra"""
+    objects = _objects()
+    if objects is None:
+        return
+    lookups = [(COLLECTION, path) for path in collections]
+    lookups += [(RESOURCE, path) for path in resources]
+    missing = []
+    for key in set(lookups):
+        if key in objects:
+            continue
+        if _shared is not None:
+            found, obj = _shared.get(key)
+            if found:
+                _store(key, obj)
+                continue
+        missing.append(key)
+    if len(missing) < 2:
+        # Nothing to gain from the pool
+        for kind, path in missing:
+            _find(kind, path)
+        return
+    futures = [(key, _executor.submit(FINDERS[key[0]], key[1]))
+               for key in missing]
+    for key, future in futures:
+        _store(key, future.result())
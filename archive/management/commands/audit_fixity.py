@@ -0,0 +1,118 @@
+"""Fixity audit
+
+Read the content of every resource, compute its SHA-256 and compare it with
+the checksum recorded when it was written. Reads are limited to a budget of
+bytes per second (FIXITY_BYTES_PER_SECOND or --rate) so the audit can run
+next to the foreground traffic. Progress is saved in AuditCheckpoint every
+--checkpoint resources, a new run resumes after the last saved path until
+the walk is complete.
+
+Mismatches are logged and reported in the activity feed.
+
+    python manage.py audit_fixity [--rate BYTES] [--restart] [--record-missing]
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import hashlib
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from drastic.models import Notification
+
+from archive.blobs import blob_id, iter_content
+from archive.models import AuditCheckpoint, BlobInfo
+from archive.throttle import Throttle
+from archive.walk import walk_resources
+
+
+CHECKPOINT_NAME = "fixity"
+# Name used for the reports in the activity feed
+AUDIT_USER = "fixity-audit"
+
+
+def content_checksum(uuid, throttle):
+    """Return the hex SHA-256 of a blob read within the budget of a
+    throttle"""
+    hasher = hashlib.sha256()
+    for data in iter_content(uuid):
+        hasher.update(data)
+        throttle.consume(len(data))
+    return hasher.hexdigest()
+
+
+def report_mismatch(resource, expected, actual):
+    """Add a fixity failure to the activity feed"""
+    state = resource.to_dict()
+    Notification.update_resource(AUDIT_USER, resource.path, {
+        "pre": state,
+        "post": state,
+        "fixity": {"algorithm": "SHA-256",
+                   "expected": expected,
+                   "actual": actual},
+    })
+
+
+class Command(BaseCommand):
+    help = "Check the content of the resources against their ingest checksum"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=int,
+                            default=getattr(settings, "FIXITY_BYTES_PER_SECOND", 0),
+                            help="Bytes read per second, 0 for no limit")
+        parser.add_argument("--restart", action="store_true",
+                            help="Start from the beginning rather than from "
+                                 "the last checkpoint")
+        parser.add_argument("--checkpoint", type=int, default=100,
+                            help="Resources checked between checkpoints")
+        parser.add_argument("--record-missing", action="store_true",
+                            help="Record the checksum of blobs written "
+                                 "before checksums were computed")
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger("drastic")
+        checkpoint = AuditCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        if checkpoint is None or checkpoint.path is None or options["restart"]:
+            checkpoint = AuditCheckpoint(name=CHECKPOINT_NAME, path=None,
+                                         checked=0, failures=0)
+        else:
+            self.stdout.write(u"Resuming after '{}'".format(checkpoint.path))
+        throttle = Throttle(options["rate"])
+        unverified = 0
+
+        for resource in walk_resources(after=checkpoint.path):
+            uuid = blob_id(resource.url)
+            info = None
+            if uuid is not None:
+                info = BlobInfo.objects.filter(uuid=uuid).first()
+            if info is not None and info.expected is not None:
+                # Upload in progress
+                uuid = None
+            if uuid is not None:
+                actual = content_checksum(uuid, throttle)
+                if info is None or not info.sha256:
+                    unverified += 1
+                    if options["record_missing"]:
+                        BlobInfo.objects.filter(uuid=uuid).update(sha256=actual)
+                elif info.sha256 != actual:
+                    checkpoint.failures += 1
+                    logger.error(u"Fixity check failed for '{}': expected {} got {}".format(resource.path, info.sha256, actual))
+                    self.stdout.write(u"MISMATCH {}".format(resource.path))
+                    report_mismatch(resource, info.sha256, actual)
+            checkpoint.checked += 1
+            checkpoint.path = resource.path
+            if checkpoint.checked % options["checkpoint"] == 0:
+                checkpoint.updated = datetime.utcnow()
+                checkpoint.save()
+
+        self.stdout.write(u"{} resources checked, {} mismatches, {} without "
+                          u"checksum".format(checkpoint.checked,
+                                             checkpoint.failures, unverified))
+        # The walk is complete, the next run starts again from the beginning
+        checkpoint.path = None
+        checkpoint.updated = datetime.utcnow()
+        checkpoint.save()
@@ -0,0 +1,113 @@
+"""Benchmark of the chunk codecs
+
+Compare the compression ratio and the encode/decode throughput of the
+codecs of archive.chunk_codecs on CHUNK_SIZE chunks. Files given on the
+command line are used as payloads, otherwise a set of synthetic payloads
+close to what we usually store (text, CSV, JSON, already compressed data)
+is generated.
+
+    python manage.py benchmark_codecs [--level gzip=1] [file ...]
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import json
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.blobs import CHUNK_SIZE
+from archive.chunk_codecs import CODECS, get_codec
+
+
+def synthetic_payloads(size):
+    """Return a list of (name, data) payloads of about size bytes"""
+    rnd = random.Random(0)
+    words = ["drastic", "archive", "collection", "resource", "metadata",
+             "cassandra", "sample", "value", "object", "container"]
+    text = " ".join(rnd.choice(words) for _ in range(size // 6))[:size]
+    csv = "\n".join(",".join("{:.4f}".format(rnd.random()) for _ in range(8))
+                    for _ in range(size // 56))[:size]
+    records = []
+    while sum(len(r) for r in records) < size:
+        records.append(json.dumps({"id": len(records),
+                                   "name": rnd.choice(words),
+                                   "values": [rnd.randint(0, 1000)
+                                              for _ in range(5)]}))
+    return [
+        ("text", text),
+        ("csv", csv),
+        ("json", "\n".join(records)[:size]),
+        ("random", os.urandom(size)),
+    ]
+
+
+def measure(codec, level, data, repeat):
+    """Return (encoded size, encode seconds, decode seconds) for data cut
+    in CHUNK_SIZE chunks"""
+    chunks = [data[idx:idx + CHUNK_SIZE]
+              for idx in range(0, len(data), CHUNK_SIZE)]
+    start = time.time()
+    for _ in range(repeat):
+        encoded = [codec.encode(chunk, level) for chunk in chunks]
+    encode_time = (time.time() - start) / repeat
+    start = time.time()
+    for _ in range(repeat):
+        for blob in encoded:
+            codec.decode(blob)
+    decode_time = (time.time() - start) / repeat
+    return sum(len(blob) for blob in encoded), encode_time, decode_time
+
+
+class Command(BaseCommand):
+    help = "Compare the chunk codecs on sample payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*",
+                            help="Files used as payloads")
+        parser.add_argument("--size", type=int, default=8 * CHUNK_SIZE,
+                            help="Size of the synthetic payloads")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="Number of runs averaged for each codec")
+        parser.add_argument("--level", action="append", default=[],
+                            metavar="CODEC=LEVEL",
+                            help="Compression level of a codec, may be "
+                                 "given several times for the same codec")
+
+    def handle(self, *args, **options):
+        levels = {}
+        for value in options["level"]:
+            name, _, level = value.partition("=")
+            try:
+                get_codec(name)
+                levels.setdefault(name, []).append(int(level))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if options["files"]:
+            payloads = []
+            for path in options["files"]:
+                with open(path, "rb") as f:
+                    payloads.append((os.path.basename(path), f.read()))
+        else:
+            payloads = synthetic_payloads(options["size"])
+
+        self.stdout.write("{:<12} {:<6} {:>6} {:>8} {:>12} {:>12}".format(
+            "payload", "codec", "level", "ratio", "encode MB/s",
+            "decode MB/s"))
+        for payload_name, data in payloads:
+            megabytes = len(data) / 1048576.0
+            for name, codec in CODECS.items():
+                for level in levels.get(name, [codec.default_level]):
+                    size, encode_time, decode_time = measure(
+                        codec, level, data, options["repeat"])
+                    self.stdout.write(
+                        "{:<12} {:<6} {:>6} {:>8.3f} {:>12.1f} {:>12.1f}".format(
+                            payload_name[:12], name,
+                            "-" if level is None else level,
+                            float(size) / max(len(data), 1),
+                            megabytes / max(encode_time, 1e-9),
+                            megabytes / max(decode_time, 1e-9)))
@@ -0,0 +1,172 @@
+"""Blob garbage collection
+
+Delete the blobs no resource points to: uploads whose resource was never
+created (a name conflict detected after the upload), blobs replaced by an
+update, chunks of aborted uploads. With deduplication the chunk contents
+no blob references are deleted as well.
+
+Mark: walk every resource and record the blob it points to, plus the blobs
+of the multipart and staged uploads in progress and the contents referenced by the
+deduplicated blobs. Sweep: list the DataObject blobs and the ChunkContent
+rows, the unmarked ones become OrphanCandidate rows. A candidate is only
+deleted by a run happening after the grace period, if it's still
+unreferenced then. Blobs being written when a run starts are therefore
+never deleted, as long as their upload takes less than the grace period.
+Multipart and staged uploads older than the grace period are aborted.
+
+Deletions are made in batches limited to --rate blobs per second.
+--dry-run reports what would be deleted without writing anything.
+
+    python manage.py collect_blobs [--grace SECONDS] [--rate N] [--dry-run]
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from drastic.models import DataObject
+
+from archive.blobs import blob_id
+from archive.dedup import ref_hash, release_rows
+from archive.models import (
+    BlobInfo,
+    ChunkContent,
+    ChunkRefs,
+    OrphanCandidate,
+    StagedUpload,
+    UploadSession
+)
+from archive.multipart import abort_session
+from archive.throttle import Throttle
+from archive.walk import walk_resources
+
+
+BLOB = "blob"
+CHUNK = "chunk"
+
+
+class Command(BaseCommand):
+    help = "Delete the blobs and chunk contents no resource references"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace", type=int,
+                            default=getattr(settings, "BLOB_GC_GRACE_PERIOD", 86400),
+                            help="Seconds an orphan stays unreferenced "
+                                 "before it's deleted")
+        parser.add_argument("--rate", type=int, default=50,
+                            help="Blobs deleted per second, 0 for no limit")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report the orphans without deleting them")
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        self.throttle = Throttle(options["rate"])
+        now = datetime.utcnow()
+        self.deadline = now - timedelta(seconds=options["grace"])
+        self.now = now
+        self.stats = Counter()
+
+        referenced, digests = self.mark()
+        candidates = dict((c.key, c)
+                          for c in OrphanCandidate.objects.limit(None))
+
+        for row in DataObject.objects.distinct(["uuid"]).limit(None):
+            if row.uuid not in referenced:
+                self.sweep(BLOB, row.uuid, candidates.pop(row.uuid, None))
+        for row in ChunkContent.objects.only(["hash"]).limit(None):
+            if row.hash not in digests:
+                self.sweep(CHUNK, row.hash, candidates.pop(row.hash, None))
+
+        # What's left has been referenced again or deleted by other means
+        for candidate in candidates.values():
+            if not self.dry_run:
+                candidate.delete()
+
+        verb = "would be" if self.dry_run else "were"
+        self.stdout.write(
+            u"{} blobs and {} chunk contents {} deleted ({} bytes), {} new "
+            u"orphans, {} stale uploads".format(
+                self.stats["blob"], self.stats["chunk"], verb,
+                self.stats["bytes"], self.stats["found"],
+                self.stats["sessions"]))
+
+    def mark(self):
+        """Return the set of referenced blob uuids and a Counter of the
+        referenced chunk digests"""
+        referenced = set()
+        for resource in walk_resources():
+            uuid = blob_id(resource.url)
+            if uuid is not None:
+                referenced.add(uuid)
+        for session in UploadSession.objects.limit(None):
+            if session.created > self.deadline:
+                referenced.add(session.blob)
+                continue
+            self.stats["sessions"] += 1
+            self.stdout.write(u"Stale multipart upload {} for '{}'".format(
+                session.id, session.path))
+            if not self.dry_run:
+                abort_session(session)
+        for staged in StagedUpload.objects.limit(None):
+            if staged.created > self.deadline:
+                referenced.add(staged.blob)
+                continue
+            self.stats["sessions"] += 1
+            self.stdout.write(u"Stale staged upload for '{}'".format(staged.path))
+            if not self.dry_run:
+                # The blob is deleted as an orphan
+                staged.delete()
+        digests = Counter()
+        for info in BlobInfo.objects.filter(dedup=True).allow_filtering().limit(None):
+            if info.uuid not in referenced:
+                continue
+            for entry in DataObject.objects.filter(uuid=info.uuid).limit(None):
+                digest = ref_hash(entry.blob)
+                if digest:
+                    digests[digest] += 1
+        return referenced, digests
+
+    def sweep(self, kind, key, candidate):
+        """Record a new orphan or delete one older than the grace period"""
+        if candidate is None:
+            self.stats["found"] += 1
+            if not self.dry_run:
+                OrphanCandidate.create(key=key, kind=kind, found=self.now)
+            return
+        if candidate.found > self.deadline:
+            return
+        if kind == BLOB:
+            info = BlobInfo.objects.filter(uuid=key).first()
+            size = info.size if info is not None and info.size else 0
+            self.stdout.write(u"Orphan blob {} ({} bytes)".format(key, size))
+            if not self.dry_run:
+                if info is not None and info.dedup:
+                    release_rows(key)
+                DataObject.objects.filter(uuid=key).delete()
+                BlobInfo.objects.filter(uuid=key).delete()
+        else:
+            counter = ChunkRefs.objects.filter(hash=key).first()
+            refs = counter.refs if counter is not None else 0
+            if refs > 0:
+                # References deleted by drastic weren't released, the
+                # counter is reset and the content deleted by the next run
+                # unless a new reference shows up in between
+                self.stdout.write(u"Stale counter for chunk {} ({})".format(key, refs))
+                if not self.dry_run:
+                    counter.refs -= refs
+                    counter.save()
+                return
+            size = 0
+            self.stdout.write(u"Orphan chunk {}".format(key))
+            if not self.dry_run:
+                ChunkContent.objects.filter(hash=key).delete()
+        self.stats[kind] += 1
+        self.stats["bytes"] += size
+        if not self.dry_run:
+            candidate.delete()
+        self.throttle.consume(1)
@@ -0,0 +1,48 @@
+"""Resume the background jobs
+
+Run again the jobs still processing, left behind by a worker which stopped
+or died while running them. Jobs are idempotent, a job resumed while its
+worker is still running it is only done twice. --older-than skips the jobs
+which reported progress recently. --list only shows the unfinished jobs and
+their progress.
+
+    python manage.py resume_jobs [--older-than SECONDS] [--list]
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from archive.jobs import run, unfinished_jobs
+# Register the job kinds
+import archive.operations
+import archive.writer
+
+
+class Command(BaseCommand):
+    help = "Run again the background jobs left unfinished"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=600,
+                            help="Only resume the jobs without progress for "
+                                 "this many seconds")
+        parser.add_argument("--list", action="store_true",
+                            help="List the unfinished jobs without running them")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for current in unfinished_jobs():
+                self.stdout.write(u"{} {} on '{}' by {}: {}% (updated {})".format(
+                    current.id, current.kind, current.path, current.owner,
+                    current.percent, current.updated))
+            return
+        older_than = datetime.utcnow() - timedelta(seconds=options["older_than"])
+        jobs = unfinished_jobs(older_than)
+        for current in jobs:
+            self.stdout.write(u"Resuming job {} ({} on '{}')".format(
+                current.id, current.kind, current.path))
+            run(current.id)
+        self.stdout.write(u"{} jobs resumed".format(len(jobs)))
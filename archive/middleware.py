@@ -0,0 +1,26 @@
+"""Archive Middleware
+
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from archive.lookup import (
+    begin_request,
+    end_request
+)
+
+
+class LookupMiddleware(object):
+    """
+    Gives each request its own identity map for collections and resources,
+    see archive.lookup.
+    """
+
+    def process_request(self, request):
+        begin_request()
+        return None
+
+    def process_response(self, request, response):
+        end_request()
+        return response
@@ -1,8 +1,158 @@
 """Archive Models
 
+Cassandra tables used by the web application in addition to the ones
+defined by drastic. They are created when the application starts, see
+DrasticAppConfig.
 """
 __copyright__ = "Copyright (C) 2016 University of Maryland"
 __license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
 
 
-from django.db import models
\ No newline at end of file
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ChildCount(Model):
+    """Number of children of a collection, maintained by the write paths so
+    that it never has to be computed from a full listing. The row is keyed by
+    the uuid of the collection so a collection created again at the same path
+    starts from a fresh counter."""
+    uuid = columns.Text(partition_key=True)
+    children = columns.Counter()
+
+
+class ChildCountSeed(Model):
+    """Marker of the ChildCount counter of a collection seeded from a
+    listing, it's inserted with IF NOT EXISTS so that only one worker adds
+    the listed children to the counter"""
+    uuid = columns.Text(partition_key=True)
+    seeded = columns.DateTime()
+
+
+class BlobInfo(Model):
+    """Information on a blob (the DataObject rows holding the content of a
+    resource) that drastic doesn't store, written when the blob is
+    complete"""
+    uuid = columns.Text(partition_key=True)
+    # Name of the archive.chunk_codecs codec used for the chunks
+    codec = columns.Text()
+    size = columns.BigInt()
+    chunks = columns.Integer()
+    # Size announced by a resumable upload which isn't complete, size and
+    # chunks are then the committed part
+    expected = columns.BigInt()
+    # The rows may be references to ChunkContent, see archive.dedup
+    dedup = columns.Boolean(default=False)
+    # Hex SHA-256 of the content computed at ingest, None until the blob is
+    # complete
+    sha256 = columns.Text()
+
+
+class ChunkContent(Model):
+    """Content of a deduplicated chunk, keyed by the SHA-256 of the
+    decoded data"""
+    hash = columns.Text(partition_key=True)
+    blob = columns.Blob()
+    compressed = columns.Boolean()
+
+
+class ChunkRefs(Model):
+    """Number of blob rows referencing a ChunkContent"""
+    hash = columns.Text(partition_key=True)
+    refs = columns.Counter()
+
+
+class UploadSession(Model):
+    """Multipart upload in progress, see archive.multipart"""
+    id = columns.Text(partition_key=True)
+    path = columns.Text()
+    # Name of the user who started the upload
+    owner = columns.Text()
+    mimetype = columns.Text()
+    # Blob the parts are written to
+    blob = columns.Text()
+    part_size = columns.BigInt()
+    created = columns.DateTime()
+
+
+class UploadPart(Model):
+    """Part received for a multipart upload"""
+    session = columns.Text(partition_key=True)
+    number = columns.Integer(primary_key=True)
+    size = columns.BigInt()
+    chunks = columns.Integer()
+    codec = columns.Text()
+    dedup = columns.Boolean(default=False)
+
+
+class StagedUpload(Model):
+    """Resumable upload replacing the content of an existing resource. The
+    parts are written to a new blob, the resource keeps its content until
+    the upload is complete"""
+    path = columns.Text(partition_key=True)
+    blob = columns.Text()
+    created = columns.DateTime()
+
+
+class AuditCheckpoint(Model):
+    """Progress of a walk of the whole archive by a maintenance command,
+    so that an interrupted run resumes where it stopped"""
+    name = columns.Text(partition_key=True)
+    # Last path processed, None once the walk is complete
+    path = columns.Text()
+    checked = columns.BigInt()
+    failures = columns.BigInt()
+    updated = columns.DateTime()
+
+
+class OrphanCandidate(Model):
+    """Blob or chunk content found unreferenced by the garbage collection,
+    it's deleted by a later run if it's still unreferenced once the grace
+    period is over"""
+    key = columns.Text(partition_key=True)
+    # "blob" (DataObject uuid) or "chunk" (ChunkContent hash)
+    kind = columns.Text()
+    found = columns.DateTime()
+
+
+class Job(Model):
+    """Long running operation run in the background, see archive.jobs"""
+    id = columns.Text(partition_key=True)
+    kind = columns.Text()
+    # Collection or resource the client polls for completion
+    path = columns.Text()
+    owner = columns.Text()
+    # JSON encoded arguments of the job function
+    params = columns.Text()
+    # "Processing", "Complete" or "Error" as in cdmi_completionStatus
+    status = columns.Text()
+    percent = columns.Integer()
+    error = columns.Text()
+    created = columns.DateTime()
+    updated = columns.DateTime()
+
+
+class Tombstone(Model):
+    """Collection being deleted in the background, it and everything below
+    it are hidden from the lookups until the deletion is done, see
+    archive.tombstone"""
+    path = columns.Text(partition_key=True)
+    owner = columns.Text()
+    created = columns.DateTime()
+
+
+# Tables synchronised by DrasticAppConfig.ready()
+TABLES = [
+    ChildCount,
+    ChildCountSeed,
+    BlobInfo,
+    ChunkContent,
+    ChunkRefs,
+    UploadSession,
+    UploadPart,
+    StagedUpload,
+    AuditCheckpoint,
+    OrphanCandidate,
+    Job,
+    Tombstone,
+]
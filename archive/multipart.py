@@ -0,0 +1,146 @@
+"""Archive multipart uploads
+
+A multipart upload sends the content of a resource as numbered parts, from
+1, which may be uploaded concurrently by several clients or threads and in
+any order. Every part is written to the same blob: part n starts at chunk
+(n - 1) * part_size / CHUNK_SIZE. Once all the parts are there the chunks
+of the blob already follow each other and completing the upload doesn't
+copy anything. Each part but the last one must have exactly part_size
+bytes, a multiple of CHUNK_SIZE.
+
+The blob is created with the metadata, the ACL and the creation time of
+the resource it replaces, drastic keeps them in the first row of the blob.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from datetime import datetime
+from uuid import uuid4
+
+from drastic.models import DataObject
+
+from archive.blobs import CHUNK_SIZE
+from archive.dedup import release_rows
+from archive.models import BlobInfo, UploadPart, UploadSession
+from archive.writer import BlobWriter, copy_stream, submit_checksum
+
+
+DEFAULT_PART_SIZE = 8 * CHUNK_SIZE
+MAX_PART_SIZE = 1024 * CHUNK_SIZE
+MAX_PARTS = 10000
+
+
+class MultipartError(ValueError):
+    """Invalid multipart upload request"""
+
+
+def create_session(path, owner, mimetype, part_size=None, metadata=None,
+                   acl=None, create_ts=None):
+    """Start a multipart upload for a path and return its UploadSession.
+    metadata, acl and create_ts are given to the first row of the blob"""
+    part_size = part_size or DEFAULT_PART_SIZE
+    if (part_size % CHUNK_SIZE or part_size <= 0 or
+            part_size > MAX_PART_SIZE):
+        raise MultipartError(u"The part size must be a multiple of {} up to "
+                             u"{} bytes".format(CHUNK_SIZE, MAX_PART_SIZE))
+    # The first row gives the uuid of the blob, part 1 replaces it
+    blob = DataObject.create(None, False, metadata=metadata,
+                             create_ts=create_ts, acl=acl).uuid
+    return UploadSession.create(id=uuid4().hex,
+                                path=path,
+                                owner=owner,
+                                mimetype=mimetype,
+                                blob=blob,
+                                part_size=part_size,
+                                created=datetime.utcnow())
+
+
+def get_session(upload_id):
+    """Return the UploadSession of an upload, None if it doesn't exist"""
+    return UploadSession.objects.filter(id=upload_id).first()
+
+
+def list_parts(session):
+    """Return the parts received for an upload ordered by number"""
+    return list(UploadPart.objects.filter(session=session.id).limit(None))
+
+
+def write_part(session, number, stream):
+    """Write a part read from a file-like object. Sending a part again
+    replaces it"""
+    if number < 1 or number > MAX_PARTS:
+        raise MultipartError(u"Part numbers go from 1 to {}".format(MAX_PARTS))
+    writer = BlobWriter(mimetype=session.mimetype)
+    # Write in place in the blob of the session
+    writer.uuid = session.blob
+    writer.seq_number = (number - 1) * (session.part_size // CHUNK_SIZE)
+    first_seq = writer.seq_number
+    previous = UploadPart.objects.filter(session=session.id,
+                                         number=number).first()
+    if previous is not None:
+        # The part is sent again, the references of the rows it replaces
+        # are released. The part is forgotten first so a failed write
+        # can't release them twice
+        previous.delete()
+        if previous.dedup:
+            release_rows(session.blob, first_seq, first_seq + previous.chunks)
+    copy_stream(stream, writer, session.part_size)
+    writer.flush()
+    if stream is not None and stream.read(1):
+        raise MultipartError(u"Parts can't be larger than {} bytes"
+                             u"".format(session.part_size))
+    return UploadPart.create(session=session.id,
+                             number=number,
+                             size=writer.size,
+                             chunks=writer.seq_number - first_seq,
+                             codec=writer.codec,
+                             dedup=writer.dedup)
+
+
+def complete_session(session):
+    """Check that the parts of an upload form the whole content, record the
+    blob and end the session. Return (blob uuid, size)"""
+    parts = list_parts(session)
+    if not parts:
+        raise MultipartError("No part has been uploaded")
+    # The parts have to follow each other from 1
+    if [part.number for part in parts] != range(1, len(parts) + 1):
+        raise MultipartError("Some parts are missing")
+    for part in parts[:-1]:
+        if part.size != session.part_size:
+            raise MultipartError(u"Part {} has {} bytes instead of {}".format(
+                part.number, part.size, session.part_size))
+    size = sum(part.size for part in parts)
+    chunks = ((len(parts) - 1) * (session.part_size // CHUNK_SIZE) +
+              parts[-1].chunks)
+    if chunks:
+        # A last part sent again with less data may have left chunks behind
+        if any(part.dedup for part in parts):
+            release_rows(session.blob, chunks)
+        DataObject.objects.filter(uuid=session.blob,
+                                  sequence_number__gte=chunks).delete()
+    codecs = set(part.codec for part in parts)
+    BlobInfo.create(uuid=session.blob,
+                    codec=codecs.pop() if len(codecs) == 1 else "mixed",
+                    size=size,
+                    chunks=chunks,
+                    dedup=any(part.dedup for part in parts))
+    # Parts arrive in any order, the content is hashed in the background
+    # once complete
+    submit_checksum(session.blob)
+    end_session(session)
+    return session.blob, size
+
+
+def abort_session(session):
+    """Delete the chunks written for an upload and end the session"""
+    if any(part.dedup for part in list_parts(session)):
+        release_rows(session.blob)
+    DataObject.objects.filter(uuid=session.blob).delete()
+    end_session(session)
+
+
+def end_session(session):
+    UploadPart.objects.filter(session=session.id).delete()
+    session.delete()
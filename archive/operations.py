@@ -0,0 +1,423 @@
+"""Archive copy and move
+
+Server-side copy and move of resources and collections, shared by the CDMI
+and WebDAV front ends. No content goes through the client.
+
+A move only writes tree entries: the resource is created at its new path
+with the url of its blob and the old entry is removed without touching the
+blob. Moving a collection moves its children one by one, then removes the
+emptied source collections. Collections can be copied, moved or deleted
+by a background job, see submit_transfer and delete_collection, as well as
+data objects of BACKGROUND_COPY_SIZE bytes or more, see submit_copy.
+
+drastic keeps the metadata and the ACL of a resource in the first row of
+its blob and deletes the blob with the resource, so a copy can't point to
+the same blob. It gets a new blob of references to the same chunk
+contents, see archive.dedup. The first copy of a blob written without
+deduplication moves its chunks to ChunkContent, as they are stored, and
+turns its rows into references: its content goes through the worker once,
+later copies only write references. Blobs without a BlobInfo row (written
+before it existed) and uploads still in progress are copied row by row.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from datetime import datetime
+
+from django.conf import settings
+
+from drastic.models import Collection, DataObject, Resource, TreeEntry
+from drastic.util import merge, split
+
+from archive.blobs import BLOB_SCHEME, blob_id, decode_chunk, iter_entries
+from archive.dedup import add_ref, chunk_hash, make_ref, ref_hash, release_blob
+from archive.jobs import job, progress, submit
+from archive.lookup import find_collection, find_resource, forget, remember
+from archive.models import BlobInfo, ChildCount, ChildCountSeed, ChunkContent
+from archive.throttle import Throttle
+from archive.tombstone import bury, unbury
+from archive.tree import add_child, child_count, get_children, remove_child
+from archive.writer import write_blob
+
+
+# Children listed at once by a background delete
+DELETE_BATCH = 1000
+# Passes over the children of a collection being moved, a pass moves the
+# children created during the previous one
+MOVE_PASSES = 3
+
+
+def inside(path, ancestor):
+    """Return True if path is ancestor or below it"""
+    ancestor = ancestor.rstrip('/')
+    return path == ancestor or path.startswith(ancestor + '/')
+
+
+def share_blob(uuid):
+    """Turn the rows of a complete blob written without deduplication into
+    references, so that its copies share its chunks. The chunks are moved
+    as they are stored, they are only decoded to be hashed. Return False if
+    the blob can't be shared"""
+    info = BlobInfo.objects.filter(uuid=uuid).first()
+    if info is None or info.expected is not None:
+        return False
+    if info.dedup:
+        return True
+    # From now on release_blob releases the rows already turned into
+    # references
+    BlobInfo.objects.filter(uuid=uuid).update(dedup=True)
+    for entry in iter_entries(uuid, raw=True):
+        if not entry.blob or ref_hash(entry.blob):
+            continue
+        digest = chunk_hash(decode_chunk(entry))
+        add_ref(digest)
+        existing = (ChunkContent.objects.filter(hash=digest)
+                    .only(["hash"]).first())
+        if existing is None:
+            ChunkContent.create(hash=digest, blob=entry.blob,
+                                compressed=entry.compressed)
+        # The first row keeps its metadata, the insert doesn't write the
+        # columns left to None
+        DataObject.append_chunk(uuid, make_ref(digest),
+                                entry.sequence_number, False)
+    return True
+
+
+def copy_blob(uuid, metadata=None, acl=None, create_ts=None):
+    """Copy a blob to a new blob and return its uuid, the copy references
+    the chunks of the blob when it can be shared. metadata, acl and
+    create_ts are given to the first row"""
+    share_blob(uuid)
+    new_uuid = None
+    for entry in iter_entries(uuid, raw=True):
+        digest = ref_hash(entry.blob)
+        if digest:
+            add_ref(digest)
+        if new_uuid is None:
+            data_object = DataObject.create(entry.blob, entry.compressed,
+                                            metadata=metadata,
+                                            create_ts=create_ts,
+                                            acl=acl)
+            new_uuid = data_object.uuid
+        else:
+            DataObject.append_chunk(new_uuid, entry.blob,
+                                    entry.sequence_number, entry.compressed)
+    if new_uuid is None:
+        new_uuid = DataObject.create(None, False, metadata=metadata,
+                                     create_ts=create_ts, acl=acl).uuid
+    info = BlobInfo.objects.filter(uuid=uuid).first()
+    if info is not None:
+        BlobInfo.create(uuid=new_uuid,
+                        codec=info.codec,
+                        size=info.size,
+                        chunks=info.chunks,
+                        expected=info.expected,
+                        dedup=info.dedup,
+                        sha256=info.sha256)
+    return new_uuid
+
+
+def _create_resource(resource, parent, name, url, username, size=None):
+    """Create a resource at parent/name with the attributes of another
+    one"""
+    new = Resource.create(name=name,
+                          container=parent,
+                          url=url,
+                          mimetype=resource.get_mimetype(),
+                          size=resource.size if size is None else size,
+                          metadata=resource.get_metadata(),
+                          username=username)
+    read_access, write_access = resource.get_acl_list()
+    new.create_acl_list(read_access, write_access)
+    remember(new)
+    add_child(find_collection(parent))
+    return new
+
+
+def _create_collection(collection, parent, name, username):
+    new = Collection.create(name=name,
+                            container=parent,
+                            metadata=collection.get_cdmi_metadata(),
+                            username=username)
+    read_access, write_access = collection.get_acl_list()
+    new.create_acl_list(read_access, write_access)
+    remember(new)
+    add_child(find_collection(parent))
+    return new
+
+
+def _copy_url(resource):
+    """Copy the blob of a resource and return the url of the copy"""
+    uuid = blob_id(resource.url)
+    if uuid is None:
+        # A reference, the url is all there is to copy
+        return resource.url
+    return "{}{}".format(BLOB_SCHEME, copy_blob(
+        uuid, resource.get_metadata(), resource.get_acl(), datetime.now()))
+
+
+def _remove_entry(resource):
+    """Remove a moved resource from the tree. Only the tree entry goes,
+    drastic would delete the blob with the resource"""
+    TreeEntry.objects.filter(container=resource.container,
+                             name=resource.name).delete()
+    forget(resource.path)
+    remove_child(find_collection(resource.container))
+
+
+def copy_resource(resource, parent, name, username=None):
+    """Copy a resource to parent/name and return the copy"""
+    return _create_resource(resource, parent, name, _copy_url(resource),
+                            username)
+
+
+def move_resource(resource, parent, name, username=None):
+    """Move a resource to parent/name and return it at its new path, the
+    blob isn't copied"""
+    new = _create_resource(resource, parent, name, resource.url, username)
+    _remove_entry(resource)
+    return new
+
+
+def replace_resource(resource, source, move=False):
+    """Copy (or move with move set) source over an existing resource and
+    return it. The destination takes the content, the metadata and the ACL
+    of the source, its old blob is only deleted once the copy is written"""
+    url = source.url if move else _copy_url(source)
+    release_blob(blob_id(resource.url))
+    resource.delete_blobs()
+    resource.update(url=url, size=source.size, mimetype=source.get_mimetype())
+    forget(resource.path)
+    if move:
+        _remove_entry(source)
+    return find_resource(resource.path)
+
+
+def copy_in_background(resource):
+    """Return True if a copy of a resource has to be made by a background
+    job"""
+    return (blob_id(resource.url) is not None and
+            resource.size >= getattr(settings, "BACKGROUND_COPY_SIZE",
+                                     64 * 1048576))
+
+
+def prepare_copy(source, parent, name, resource=None, username=None):
+    """Prepare the destination of a copy made by a background job and
+    return it. A new destination is created empty, an existing one keeps
+    its content until the copy is written. Both take the metadata and the
+    ACL of the source at once, the job copies them with the content"""
+    if resource is None:
+        empty = write_blob("", metadata=source.get_metadata(),
+                           acl=source.get_acl(), create_ts=datetime.now())
+        return _create_resource(source, parent, name, empty.url, username,
+                                size=0)
+    resource.update(metadata=source.get_metadata())
+    read_access, write_access = source.get_acl_list()
+    resource.create_acl_list(read_access, write_access)
+    forget(resource.path)
+    return find_resource(resource.path)
+
+
+def submit_copy(resource, source, username=None):
+    """Copy the content of source to a destination prepared by
+    prepare_copy in a background job. The completion status of the
+    destination tells when the job is done, return the Job"""
+    return submit("copy_resource", resource.path, username,
+                  source=source.path)
+
+
+@job("copy_resource")
+def copy_resource_job(current, source):
+    original = find_resource(source)
+    if original is None:
+        raise ValueError(u"The resource '{}' doesn't exist".format(source))
+    resource = find_resource(current.path)
+    if resource is None:
+        # Deleted in the meantime
+        return
+    # The copy takes the metadata and the ACL the destination has now
+    url = "{}{}".format(BLOB_SCHEME, copy_blob(
+        blob_id(original.url), resource.get_metadata(), resource.get_acl(),
+        resource.get_create_ts()))
+    release_blob(blob_id(resource.url))
+    resource.delete_blobs()
+    resource.update(url=url, size=original.size,
+                    mimetype=original.get_mimetype())
+    forget(resource.path)
+
+
+def _children(collection):
+    collections, resources = collection.get_child()
+    return ([merge(collection.path, name.rstrip('/')) for name in collections],
+            [merge(collection.path, name) for name in resources])
+
+
+def copy_collection(collection, parent, name, username=None):
+    """Copy a collection and everything below it to parent/name"""
+    check_destination(collection, parent, name)
+    new = _create_collection(collection, parent, name, username)
+    copy_children(collection, new, username)
+    return new
+
+
+def copy_children(collection, new, username=None, report=None):
+    """Copy the children of a collection to another one. Children already
+    at the destination are skipped, so an interrupted copy can be run
+    again. report is called with (children done, children) if given"""
+    collections, resources = _children(collection)
+    total = len(collections) + len(resources)
+    for idx, path in enumerate(resources):
+        resource = find_resource(path)
+        target = merge(new.path, split(path)[1])
+        if resource is not None and not find_resource(target):
+            copy_resource(resource, new.path, resource.name, username)
+        if report:
+            report(idx + 1, total)
+    for idx, path in enumerate(collections):
+        child = find_collection(path)
+        if child is not None:
+            target = merge(new.path, child.name)
+            copy = (find_collection(target) or
+                    _create_collection(child, new.path, child.name, username))
+            copy_children(child, copy, username)
+        if report:
+            report(len(resources) + idx + 1, total)
+
+
+def move_collection(collection, parent, name, username=None):
+    """Move a collection and everything below it to parent/name, no blob is
+    copied"""
+    check_destination(collection, parent, name)
+    new = _create_collection(collection, parent, name, username)
+    move_children(collection, new, username)
+    return new
+
+
+def move_children(collection, new, username=None, report=None):
+    """Move the children of a collection to another one and delete the
+    emptied source collection. A child is gone from the source once moved,
+    so an interrupted move can be run again. report is called with
+    (children done, children) if given.
+
+    Children created in the source during the move are moved by another
+    pass, the source is only deleted once a listing finds it empty"""
+    for attempt in range(MOVE_PASSES + 1):
+        collections, resources = _children(collection)
+        if not collections and not resources:
+            break
+        if attempt == MOVE_PASSES:
+            raise ValueError(u"'{}' still has children, it wasn't deleted".format(collection.path))
+        total = len(collections) + len(resources)
+        for idx, path in enumerate(resources):
+            resource = find_resource(path)
+            if resource is not None:
+                move_resource(resource, new.path, resource.name, username)
+            if report and not attempt:
+                report(idx + 1, total)
+        for idx, path in enumerate(collections):
+            child = find_collection(path)
+            if child is not None:
+                target = merge(new.path, child.name)
+                moved = (find_collection(target) or
+                         _create_collection(child, new.path, child.name, username))
+                move_children(child, moved, username)
+            if report and not attempt:
+                report(len(resources) + idx + 1, total)
+    Collection.delete_all(collection.path)
+    forget(collection.path)
+    remove_child(find_collection(collection.container))
+
+
+def check_destination(collection, parent, name):
+    """Refuse to copy or move a collection inside itself"""
+    if inside(merge(parent, name), collection.path):
+        raise ValueError(u"Can't copy or move '{}' inside itself".format(collection.path))
+
+
+def submit_transfer(operation, collection, parent, name, username=None):
+    """Copy ("copy") or move ("move") a collection in a background job.
+    The destination is created at once and its completion status tells
+    when the job is done, return it"""
+    check_destination(collection, parent, name)
+    new = _create_collection(collection, parent, name, username)
+    submit("{}_collection".format(operation), new.path, username,
+           source=collection.path, username=username)
+    return new
+
+
+@job("copy_collection")
+def copy_collection_job(current, source, username=None):
+    collection = find_collection(source)
+    if collection is None:
+        raise ValueError(u"The collection '{}' doesn't exist".format(source))
+    copy_children(collection, find_collection(current.path), username,
+                  lambda done, total: progress(current, done * 100 // total))
+
+
+@job("move_collection")
+def move_collection_job(current, source, username=None):
+    collection = find_collection(source)
+    if collection is None:
+        # Already moved by a previous run
+        return
+    move_children(collection, find_collection(current.path), username,
+                  lambda done, total: progress(current, done * 100 // total))
+
+
+def delete_collection(collection, username=None):
+    """Delete a collection and everything below it in a background job.
+    The collection is tombstoned first, it disappears at once from the
+    lookups and from the listing of its parent. Return the Job"""
+    bury(collection.path, username)
+    TreeEntry.objects.filter(container=collection.container,
+                             name=collection.name + '/').delete()
+    forget(collection.path)
+    remove_child(find_collection(collection.container))
+    return submit("delete_collection", collection.path, username,
+                  username=username)
+
+
+def reclaim(collection, throttle, username=None, report=None):
+    """Delete the children of a collection in batches, then the collection.
+    The lookups are bypassed, the collection is tombstoned. report is
+    called with the number of children deleted if given"""
+    done = 0
+    while True:
+        names = get_children(collection, 0, DELETE_BATCH)
+        if not names:
+            break
+        for name in names:
+            path = merge(collection.path, name.rstrip('/'))
+            if name.endswith('/'):
+                child = Collection.find(path)
+                if child is not None:
+                    reclaim(child, throttle, username)
+            else:
+                child = Resource.find(path)
+                if child is not None:
+                    release_blob(blob_id(child.url))
+                    child.delete(username=username)
+                    throttle.consume(1)
+            # Whatever drastic left behind, so the next batch moves on
+            TreeEntry.objects.filter(container=collection.path,
+                                     name=name).delete()
+        done += len(names)
+        if report:
+            report(done)
+    Collection.delete_all(collection.path, username=username)
+    ChildCount.objects.filter(uuid=collection.uuid).delete()
+    ChildCountSeed.objects.filter(uuid=collection.uuid).delete()
+    throttle.consume(1)
+
+
+@job("delete_collection")
+def delete_collection_job(current, username=None):
+    collection = Collection.find(current.path)
+    if collection is not None:
+        total = max(child_count(collection), 1)
+        throttle = Throttle(getattr(settings, "DELETE_OBJECTS_PER_SECOND", 200))
+        reclaim(collection, throttle, username,
+                lambda done: progress(current, done * 100 // total))
+    unbury(current.path)
+    forget(current.path)
@@ -0,0 +1,30 @@
+"""Archive throttling
+
+Background maintenance (fixity audits, garbage collection) shares the
+cluster with the foreground traffic, a Throttle keeps it within a budget of
+units (bytes, rows) per second.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import time
+
+
+class Throttle(object):
+    """Sleep as needed so that the units consumed since the throttle was
+    created don't exceed rate per second, a rate of 0 doesn't limit
+    anything"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.start = time.time()
+        self.consumed = 0
+
+    def consume(self, units):
+        if not self.rate:
+            return
+        self.consumed += units
+        ahead = self.consumed / float(self.rate) - (time.time() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
@@ -0,0 +1,65 @@
+"""Archive tombstones
+
+A collection deleted in the background is tombstoned first: a Tombstone
+row records its path and the lookups of archive.lookup return None for it
+and for everything below it, as if it was already deleted. The background
+job then deletes the tree and removes the tombstone.
+
+Each worker keeps the tombstoned paths in memory and reads them again
+every TOMBSTONE_REFRESH seconds, the tombstones added by the worker itself
+are seen at once.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+from archive.models import Tombstone
+
+
+_lock = threading.Lock()
+_tombstones = {"paths": frozenset(), "expires": 0}
+
+
+def _paths():
+    """Return the set of tombstoned paths, read again once it expired"""
+    with _lock:
+        if _tombstones["expires"] < time.time():
+            _tombstones["paths"] = frozenset(
+                t.path for t in Tombstone.objects.limit(None))
+            _tombstones["expires"] = (time.time() +
+                                      getattr(settings, "TOMBSTONE_REFRESH", 5))
+        return _tombstones["paths"]
+
+
+def is_buried(path):
+    """Return True if path or one of its ancestors is tombstoned"""
+    paths = _paths()
+    if not paths:
+        return False
+    path = path.rstrip('/') or '/'
+    while True:
+        if path in paths:
+            return True
+        if path == '/':
+            return False
+        path = path.rsplit('/', 1)[0] or '/'
+
+
+def bury(path, owner):
+    """Tombstone a collection"""
+    Tombstone.create(path=path, owner=owner, created=datetime.utcnow())
+    with _lock:
+        _tombstones["paths"] = _tombstones["paths"] | frozenset([path])
+
+
+def unbury(path):
+    """Remove the tombstone of a collection once it has been deleted"""
+    Tombstone.objects.filter(path=path).delete()
+    with _lock:
+        _tombstones["paths"] = _tombstones["paths"] - frozenset([path])
@@ -0,0 +1,84 @@
+"""Archive tree
+
+Access to the children of a collection that doesn't require listing the
+whole collection. Children are read from the tree entries of the collection
+page by page, so a caller which stops iterating after a range never fetches
+the rest. The number of children is kept in a counter updated by the write
+paths of the application. Tools writing to drastic directly don't update
+it, so it's only reported as a number of children and never bounds a
+listing.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from datetime import datetime
+from itertools import islice
+
+from cassandra.cqlengine.query import LWTException
+
+from drastic.models import TreeEntry
+
+from archive.models import ChildCount, ChildCountSeed
+
+
+def iter_children(collection):
+    """Yield the names of the children of a collection in storage order,
+    containers end with a '/'"""
+    entries = TreeEntry.objects.filter(container=collection.path)
+    for entry in entries.limit(None):
+        # The '.' entry holds the collection itself
+        if entry.name == '.':
+            continue
+        yield entry.name
+
+
+def get_children(collection, start=0, stop=None):
+    """Return the names of the children between start (inclusive) and stop
+    (exclusive), the listing stops once the range is read"""
+    return list(islice(iter_children(collection), start, stop))
+
+
+def child_count(collection):
+    """Return the number of children of a collection. The first call on a
+    collection counts its children from a listing, the counter is then
+    maintained by add_child and remove_child. Counter updates can't be
+    conditional, the listing is only added to the counter by the caller
+    which inserts the ChildCountSeed marker, concurrent first calls return
+    their own listing"""
+    counter = ChildCount.objects.filter(uuid=collection.uuid).first()
+    if counter is not None:
+        return counter.children
+    nb_child = sum(1 for _ in iter_children(collection))
+    try:
+        ChildCountSeed.if_not_exists().create(uuid=collection.uuid,
+                                              seeded=datetime.utcnow())
+    except LWTException:
+        # Seeded by another caller
+        return nb_child
+    counter = ChildCount(uuid=collection.uuid)
+    counter.children += nb_child
+    counter.save()
+    return nb_child
+
+
+def _update_count(collection, delta):
+    """Apply a delta to the counter of a collection if it has been
+    initialised, otherwise the next child_count will count the children"""
+    counter = ChildCount.objects.filter(uuid=collection.uuid).first()
+    if counter is None:
+        return
+    counter.children += delta
+    counter.save()
+
+
+def add_child(collection):
+    """A child has been created in the collection"""
+    if collection:
+        _update_count(collection, 1)
+
+
+def remove_child(collection):
+    """A child has been deleted from the collection"""
+    if collection:
+        _update_count(collection, -1)
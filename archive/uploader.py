@@ -1,27 +1,57 @@
 """Archive AgentUploader
 
+Uploads of the archive views are written to Cassandra as they are received.
+The multipart body is parsed before the view runs (by the CSRF middleware),
+so the name and the permissions of a new resource are checked when the file
+part starts: the upload form passes the name in the query string and a
+rejected upload stops before any chunk is written (uploads without it are
+checked by the view once written). The form also asks
+check_resource beforehand so the file isn't sent at all.
 """
 __copyright__ = "Copyright (C) 2016 University of Maryland"
 __license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
 
 
 from io import BytesIO
-import hashlib
-import zipfile
-from cStringIO import StringIO
-from django.conf import settings
+import logging
+
 from django.core.files.uploadhandler import (
     FileUploadHandler,
-    StopFutureHandlers
+    StopFutureHandlers,
+    StopUpload
 )
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.urls import Resolver404, resolve
+
+from drastic.util import merge
+
+from archive.blobs import CHUNK_SIZE
+from archive.lookup import find_collection, find_resource
+from archive.writer import BlobWriter
+
+
+logger = logging.getLogger("drastic")
 
-from drastic.models import DataObject
+
+def check_new_resource(user, parent, name):
+    """Check that a user can create a resource called name in the collection
+    at parent. Return None if so, (HTTP status, message) otherwise"""
+    collection = find_collection(parent)
+    if not collection:
+        return 404, u"The collection '{}' doesn't exist".format(parent)
+    if not collection.user_can(user, "write"):
+        return 403, u"You can't create items in '{}'".format(collection.name)
+    if not name:
+        return 400, u"The item needs a name"
+    path = merge(collection.path, name)
+    if find_resource(path) or find_collection(path):
+        return 409, u"That name is in use within the current collection"
+    return None
 
 
 class AgentUploader(FileUploadHandler):
 
-    chunk_size = 1048576 # 1 Mb chunks
+    chunk_size = CHUNK_SIZE # 1 Mb chunks
 
     def new_file(self, field_name, file_name, content_type, content_length,
                  charset, content_type_extra):
@@ -30,40 +60,44 @@ class AgentUploader(FileUploadHandler):
         """
         self.file_name = file_name
         self.content_type = content_type
-        self.hasher = hashlib.sha256()
-        self.data = None
-        self.uuid = None
-        self.seq_number = 0
+        self.check_target()
+        self.writer = BlobWriter(mimetype=content_type)
 
         raise StopFutureHandlers()
 
+    def check_target(self):
+        """Stop the upload of a new resource which can't be created, the
+        reason is left in request.upload_rejected for the view. The name of
+        the resource is only known if the form gave it in the query string,
+        otherwise the view checks the form as before"""
+        try:
+            match = resolve(self.request.path_info)
+        except Resolver404:
+            return
+        if match.view_name != "archive:new_resource":
+            return
+        name = self.request.GET.get("name")
+        if not name:
+            return
+        rejected = check_new_resource(self.request.user,
+                                      match.kwargs.get("parent"), name)
+        if rejected:
+            self.request.upload_rejected = rejected[1]
+            # The rest of the body is read without being stored, the client
+            # gets the form with the error rather than a reset connection
+            raise StopUpload(connection_reset=False)
+
     def receive_data_chunk(self, raw_data, start):
         """
-        Will be called to write 1Mb chunks of data (except for the
-        last chunk).
+        Will be called with pieces of up to 1Mb of data. The multipart parser
+        doesn't guarantee their size, the BlobWriter buffers them and writes
+        chunks of exactly CHUNK_SIZE bytes (except for the last chunk), which
+        is what range reads rely on.
         """
-        print u"Received {} bytes - {}".format(len(raw_data), self.seq_number)
-
-        if settings.COMPRESS_UPLOADS:
-            # Compress the raw_data and store that instead
-            f = StringIO()
-            z = zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED)
-            z.writestr("data", raw_data)
-            z.close()
-
-            data = f.getvalue()
-            f.close()
-        else:
-            data = raw_data
-
-        if not self.uuid:
-            data_object = DataObject.create(data, settings.COMPRESS_UPLOADS)
-            self.uuid = data_object.uuid
-        else:
-            DataObject.append_chunk(self.uuid, data, self.seq_number, settings.COMPRESS_UPLOADS)
-        self.seq_number += 1
+        logger.debug(u"Received {} bytes - {}".format(len(raw_data), self.writer.seq_number))
 
-        self.hasher.update(data)
+        # The writer hashes the content as it's written
+        self.writer.write(raw_data)
 
         return None
 
@@ -74,15 +108,13 @@ class AgentUploader(FileUploadHandler):
             Cassandra which will itself contain a list of all of the BlobParts
             we wrote to the DB.
         """
-        print u"File upload complete with {} bytes".format(file_size)
+        logger.debug(u"File upload complete with {} bytes".format(file_size))
 
-        if file_size == 0:  # Create empty blob DataObject for zero-length files
-            if not self.uuid:
-                data_object = DataObject.create(None, settings.COMPRESS_UPLOADS)
-                self.uuid = data_object.uuid
+        # An empty blob is created for zero-length files
+        uuid = self.writer.close()
 
         uploaded = CassandraUploadedFile(name=self.file_name,
-                                         content=str(self.uuid),
+                                         content=str(uuid),
                                          content_type=self.content_type,
                                          length=file_size)
         return uploaded
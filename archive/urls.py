@@ -13,6 +13,7 @@ from archive.views import (
     delete_resource,
     delete_collection,
     new_resource,
+    check_resource,
     view_collection,
     download,
     preview
@@ -33,6 +34,7 @@ urlpatterns = [
     url(r'^delete/collection(?P<path>.*)$', delete_collection, name='delete_collection'),
 
     url(r'^new/resource(?P<parent>.*)$', new_resource, name='new_resource'),
+    url(r'^check/resource(?P<parent>.*)$', check_resource, name='check_resource'),
     url(r'^edit/resource(?P<path>.*)$', edit_resource, name='edit_resource'),
     url(r'^delete/resource(?P<path>.*)$', delete_resource, name='delete_resource'),
 
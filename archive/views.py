@@ -15,6 +15,7 @@ from django.http import (
     StreamingHttpResponse,
     Http404,
     HttpResponse,
+    JsonResponse,
 )
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import (
@@ -24,6 +25,15 @@ from django.shortcuts import (
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
+from archive.blobs import blob_id, iter_content, negotiate_gzip
+from archive.conditional import (
+    add_digest,
+    add_validators,
+    gzip_passthrough,
+    not_modified,
+    set_encoding
+)
+from archive.dedup import release_blob
 from archive.forms import (
     CollectionForm,
     CollectionNewForm,
@@ -56,6 +66,20 @@ from drastic.util import (
     merge,
 )
 
+from archive.lookup import (
+    find_collection,
+    find_resource,
+    forget,
+    prefetch,
+    remember
+)
+from archive.operations import delete_collection as delete_tree
+from archive.tree import (
+    add_child,
+    remove_child
+)
+from archive.uploader import check_new_resource
+
 
 
 def notify_agent(resource_id, event=""):
@@ -83,19 +107,20 @@ def home(request):
 ##############################################################################
 @login_required()
 def view_resource(request, path):
-    resource = Resource.find(path)
+    resource = find_resource(path)
     if not resource:
         raise Http404()
 
     if not resource.user_can(request.user, "read"):
         raise PermissionDenied
 
-    container = Collection.find(resource.container)
+    container = find_collection(resource.container)
     if not container:
         # TODO: the container has to be there. If not it may be a network
         # issue with Cassandra so we try again before raising an error to the
         # user
-        container = Collection.find(resource.container)
+        forget(resource.container)
+        container = find_collection(resource.container)
         if not container:
             return HttpResponse(status=408,
                                 content="Unable to find parent container '{}'".format(resource.container))
@@ -118,9 +143,21 @@ def view_resource(request, path):
     return render(request, 'archive/resource/view.html', ctx)
 
 
+@login_required
+def check_resource(request, parent):
+    """Tell the upload form if a resource name can be used, before the file
+    is sent"""
+    rejected = check_new_resource(request.user, parent,
+                                  request.GET.get("name", ""))
+    if rejected:
+        return JsonResponse({"available": False, "message": rejected[1]},
+                            status=rejected[0])
+    return JsonResponse({"available": True})
+
+
 @login_required
 def new_resource(request, parent):
-    parent_collection = Collection.find(parent)
+    parent_collection = find_collection(parent)
     # Inherits perms from container by default.
     if not parent_collection:
         raise Http404()
@@ -145,6 +182,11 @@ def new_resource(request, parent):
 
     if request.method == 'POST':
         form = ResourceNewForm(request.POST, files=request.FILES, initial=initial)
+        rejected = getattr(request, "upload_rejected", None)
+        if rejected:
+            # The upload handler stopped before the file was written
+            messages.add_message(request, messages.ERROR, rejected)
+            return redirect('archive:view', path=parent_collection.path)
         if form.is_valid():
             data = form.cleaned_data
             try:
@@ -171,6 +213,8 @@ def new_resource(request, parent):
                                            username=request.user.name,
                                            size=data['file'].size)
                 resource.create_acl_list(data['read_access'], data['write_access'])
+                remember(resource)
+                add_child(parent_collection)
                 messages.add_message(request, messages.INFO,
                                      u"New resource '{}' created" .format(resource.get_name()))
             except ResourceConflictError:
@@ -192,11 +236,11 @@ def new_resource(request, parent):
 @login_required
 def edit_resource(request, path):
     # Requires edit on resource
-    resource = Resource.find(path)
+    resource = find_resource(path)
     if not resource:
         raise Http404()
 
-    container = Collection.find(resource.container)
+    container = find_collection(resource.container)
     if not container:
         raise Http404()
 
@@ -220,6 +264,7 @@ def edit_resource(request, path):
                 data = form.cleaned_data
                 resource.update(metadata=metadata, username=request.user.name)
                 resource.create_acl_list(data['read_access'], data['write_access'])
+                forget(resource.path)
 
                 return redirect('archive:resource_view', path=resource.path)
             except ResourceConflictError:
@@ -250,16 +295,19 @@ def edit_resource(request, path):
 
 @login_required
 def delete_resource(request, path):
-    resource = Resource.find(path)
+    resource = find_resource(path)
     if not resource:
         raise Http404
 
     if not resource.user_can(request.user, "delete"):
         raise PermissionDenied
 
-    container = Collection.find(resource.container)
+    container = find_collection(resource.container)
     if request.method == "POST":
+        release_blob(blob_id(resource.url))
         resource.delete(username=request.user.name)
+        forget(resource.path)
+        remove_child(container)
         messages.add_message(request, messages.INFO,
                              "The resource '{}' has been deleted".format(resource.name))
         return redirect('archive:view', path=container.path)
@@ -281,7 +329,7 @@ def delete_resource(request, path):
 def view_collection(request, path):
     if not path:
         path = '/'
-    collection = Collection.find(path)
+    collection = find_collection(path)
 
     if not collection:
         raise Http404()
@@ -308,13 +356,17 @@ def view_collection(request, path):
     too_many = False
     if count > 30:
         too_many = True
+    else:
+        # Fetch the children together rather than one after the other
+        prefetch(collections=[merge(path, c) for c in children_c],
+                 resources=[merge(path, c) for c in children_r])
 
     ctx = {
         'collection': collection.to_dict(request.user),
         'children_c': [] if too_many else
-                      [Collection.find(merge(path, c)).to_dict(request.user) for c in children_c],
+                      [find_collection(merge(path, c)).to_dict(request.user) for c in children_c],
         'children_r': [] if too_many else
-                      [Resource.find(merge(path, c)).simple_dict(request.user) for c in children_r],
+                      [find_resource(merge(path, c)).simple_dict(request.user) for c in children_r],
         'children_cnames': children_c if too_many else [],
         'children_rnames': children_r if too_many else [],
         'collection_paths': paths,
@@ -365,7 +417,7 @@ def search2(request):
 
 @login_required
 def new_collection(request, parent):
-    parent_collection = Collection.find(parent)
+    parent_collection = find_collection(parent)
 
     if not parent_collection.user_can(request.user, "write"):
         raise PermissionDenied
@@ -406,6 +458,8 @@ def new_collection(request, parent):
                                                metadata=metadata,
                                                username=request.user.name)
                 collection.create_acl_list(data['read_access'], data['write_access'])
+                remember(collection)
+                add_child(parent_collection)
                 messages.add_message(request, messages.INFO,
                                      u"New collection '{}' created" .format(collection.name))
                 return redirect('archive:view', path=collection.path)
@@ -422,7 +476,7 @@ def new_collection(request, parent):
 
 @login_required
 def edit_collection(request, path):
-    coll = Collection.find(path)
+    coll = find_collection(path)
     if not coll:
         raise Http404
 
@@ -446,6 +500,7 @@ def edit_collection(request, path):
                 data = form.cleaned_data
                 coll.update(metadata=metadata, username=request.user.name)
                 coll.create_acl_list(data['read_access'], data['write_access'])
+                forget(coll.path)
                 return redirect('archive:view', path=coll.path)
             except CollectionConflictError:
                 messages.add_message(request, messages.ERROR,
@@ -469,7 +524,7 @@ def edit_collection(request, path):
 @login_required
 def delete_collection(request, path):
     "delete_coll"
-    coll = Collection.find(path)
+    coll = find_collection(path)
     if not coll:
         raise Http404
 
@@ -477,13 +532,15 @@ def delete_collection(request, path):
         raise PermissionDenied
 
     if request.method == "POST":
-        parent_coll = Collection.find(coll.path)
+        parent_coll = find_collection(coll.path)
         if parent_coll:
             parent_path = parent_coll.container
         else:
             # Just in case
             parent_path = ''
-        Collection.delete_all(coll.path, username=request.user.name)
+        # The collection disappears at once, its content is deleted in
+        # the background
+        delete_tree(coll, request.user.name)
         messages.add_message(request, messages.INFO,
                              u"The collection '{}' has been deleted".format(coll.name))
         return redirect('archive:view', path=parent_path)
@@ -499,23 +556,36 @@ def download(request, path):
 
     We will send appropriate user auth to the agent.
     """
-    resource = Resource.find(path)
+    resource = find_resource(path)
     if not resource:
         raise Http404
 
     if not resource.user_can(request.user, "read"):
         raise PermissionDenied
 
+    response = not_modified(request, resource)
+    if response is not None:
+        return response
+
+    encoding = None
     if resource.is_reference:
         r = requests.get(resource.url, stream=True)
         resp = StreamingHttpResponse(streaming_content=r,
                                      content_type=resource.get_mimetype())
     else:
-        resp = StreamingHttpResponse(streaming_content=resource.chunk_content(),
+        if gzip_passthrough(request, resource.size):
+            # Compressed chunks are sent without being inflated
+            encoding, content = negotiate_gzip(blob_id(resource.url))
+        else:
+            content = iter_content(blob_id(resource.url))
+        resp = StreamingHttpResponse(streaming_content=content,
                                      content_type=resource.get_mimetype())
+        set_encoding(resp, encoding)
+        if not encoding:
+            add_digest(resp, resource)
     resp['Content-Disposition'] = u'attachment; filename="{}"'.format(resource.name)
 
-    return resp
+    return add_validators(resp, resource, encoding)
 
 
 @login_required
@@ -524,7 +594,7 @@ def preview(request, path):
     Find the preview of the resource with the given ID and deliver it.  This will
     be rendered in the iframe of the resource view page.
     """
-    resource = Resource.find(path)
+    resource = find_resource(path)
     if not resource:
         raise Http404
 
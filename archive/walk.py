@@ -0,0 +1,48 @@
+"""Archive walk
+
+Iterate over every resource of the archive for the maintenance commands.
+The children of each collection are visited in sorted order, so the walk
+always follows the same path order and a walk interrupted after a path can
+be resumed from it without visiting the previous paths again.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+from drastic.util import merge
+
+from archive.lookup import find_collection, find_resource
+
+
+def path_key(path):
+    """Return the position of a path in the walk"""
+    return [name for name in path.split('/') if name]
+
+
+def walk_resources(path=u'/', after=None):
+    """Yield the resources below a collection in path order, starting after
+    the path given by after"""
+    collection = find_collection(path)
+    if collection is None:
+        return
+    after_key = path_key(after) if after else None
+    children_c, children_r = collection.get_child()
+    children = [(name, True) for name in children_c]
+    children += [(name, False) for name in children_r]
+    for name, is_collection in sorted(children,
+                                      key=lambda child: child[0].rstrip('/')):
+        child = merge(path, name.rstrip('/'))
+        key = path_key(child)
+        if after_key is not None:
+            if is_collection and key < after_key[:len(key)]:
+                # The whole subtree was visited
+                continue
+            if not is_collection and key <= after_key:
+                continue
+        if is_collection:
+            for resource in walk_resources(child, after):
+                yield resource
+        else:
+            resource = find_resource(child)
+            if resource is not None:
+                yield resource
@@ -0,0 +1,326 @@
+"""Archive blob writer
+
+Every upload path (CDMI, WebDAV, the archive upload handler) writes the
+content of a resource through a BlobWriter. The content is given in pieces
+of any size, it is cut in CHUNK_SIZE chunks (the geometry range reads rely
+on), each chunk is encoded with the configured codec and stored as a
+DataObject row. Unless a codec is given the writer falls back to "none"
+when the first chunk doesn't compress, the codec is recorded in the chunks
+and in BlobInfo so reads don't depend on that decision.
+
+Chunks after the first one (which creates the blob and gives its uuid) are
+encoded and written by a thread pool while the next ones are received, with
+at most BLOB_WRITE_WINDOW chunks in flight per blob. Rows are addressed by
+their sequence number so the order in which they land doesn't matter. When
+writes fail the writer waits for the ones in flight and raises the error of
+the lowest failing sequence number.
+
+With CHUNK_DEDUP set, chunks already stored by an earlier upload are only
+referenced, see archive.dedup.
+
+A resumable upload saves the blob with checkpoint() after each request,
+only full chunks are committed. BlobWriter.resume() continues it from the
+committed offset. An upload replacing the content of an existing resource
+is staged: its blob is only recorded in a StagedUpload row until it's
+complete, the resource keeps pointing to its current content.
+
+The SHA-256 of the content is computed as it's written and recorded in
+BlobInfo when the blob is complete. It's exposed as the cdmi_hash metadata
+and the Digest header of reads. The state of the hash doesn't survive the
+request, blobs completed by a resumed upload (or a multipart upload) are
+hashed by a background job reading them back, see record_checksum().
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from django.conf import settings
+
+from drastic.models import DataObject
+
+from archive.blobs import BLOB_SCHEME, CHUNK_SIZE, iter_content
+from archive.chunk_codecs import compressible, encode_chunk, get_codec
+from archive.dedup import release_rows, store_chunk
+from archive.jobs import job, submit
+from archive.models import BlobInfo, StagedUpload
+
+
+# Pool shared by all the writers of the process
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BLOB_WRITE_THREADS", 8))
+
+
+def default_codec():
+    """Return the name of the codec used for new blobs"""
+    if not settings.COMPRESS_UPLOADS:
+        return "none"
+    return getattr(settings, "CHUNK_CODEC", "zip")
+
+
+class BlobWriter(object):
+    """Write the content of a resource as a new blob.
+
+    metadata, create_ts and acl are given to the first DataObject row as
+    drastic does. mimetype helps to decide if the content is compressed.
+    expected is the announced size of a resumable upload. close() writes the
+    last chunk and returns the uuid of the blob."""
+
+    def __init__(self, codec=None, level=None, metadata=None, create_ts=None,
+                 acl=None, mimetype=None, expected=None, dedup=None):
+        self.codec = codec or default_codec()
+        # Fail before anything is written if the codec isn't available
+        get_codec(self.codec)
+        # The default codec is checked against the first chunk
+        self.detect = codec is None and self.codec != "none"
+        self.mimetype = mimetype
+        self.level = level
+        if level is None:
+            self.level = getattr(settings, "CHUNK_CODEC_LEVEL", None)
+        self.metadata = metadata
+        self.create_ts = create_ts
+        self.acl = acl
+        self.buffer = ''
+        self.uuid = None
+        self.seq_number = 0
+        self.size = 0
+        # Maximum number of chunk writes in flight, 0 to write synchronously
+        self.window = getattr(settings, "BLOB_WRITE_WINDOW", 4)
+        self.pending = deque()
+        self.expected = expected
+        if dedup is None:
+            dedup = getattr(settings, "CHUNK_DEDUP", False)
+        self.dedup = dedup
+        # SHA-256 of the content, recorded in BlobInfo by close()
+        self.hasher = hashlib.sha256()
+
+    @classmethod
+    def resume(cls, uuid):
+        """Return a writer appending to a blob saved with checkpoint(), None
+        if there's no such upload"""
+        info = BlobInfo.objects.filter(uuid=uuid).first()
+        if info is None or info.expected is None:
+            return None
+        writer = cls(codec=info.codec, expected=info.expected,
+                     dedup=info.dedup)
+        writer.uuid = uuid
+        writer.seq_number = info.chunks
+        writer.size = info.size
+        # The state of the hash isn't saved, the checksum is computed in the
+        # background once the blob is complete
+        writer.hasher = None
+        return writer
+
+    @property
+    def url(self):
+        return "{}{}".format(BLOB_SCHEME, self.uuid)
+
+    def write(self, data):
+        """Add content to the blob, full chunks are written as soon as they
+        are available"""
+        if self.buffer:
+            # Complete the pending chunk first
+            missing = CHUNK_SIZE - len(self.buffer)
+            self.buffer += data[:missing]
+            data = data[missing:]
+            if len(self.buffer) < CHUNK_SIZE:
+                return
+            self.write_chunk(self.buffer)
+            self.buffer = ''
+        # Slice the chunks in place rather than shrinking a buffer, large
+        # content would be copied for every chunk
+        offset = 0
+        while len(data) - offset >= CHUNK_SIZE:
+            self.write_chunk(data[offset:offset + CHUNK_SIZE])
+            offset += CHUNK_SIZE
+        self.buffer = data[offset:]
+
+    def write_chunk(self, data):
+        """Encode and store a chunk, or queue it once the blob exists"""
+        if self.detect:
+            self.detect = False
+            if not compressible(self.mimetype, data):
+                self.codec = "none"
+        if self.hasher is not None:
+            self.hasher.update(data)
+        if self.uuid is None:
+            # The uuid of the blob is given by its first row
+            compressed, blob = self.encode(data)
+            data_object = DataObject.create(blob, compressed,
+                                            metadata=self.metadata,
+                                            create_ts=self.create_ts,
+                                            acl=self.acl)
+            self.uuid = data_object.uuid
+        elif self.window:
+            self.wait(self.window - 1)
+            self.pending.append(_executor.submit(self.append_chunk,
+                                                 self.seq_number, data))
+        else:
+            self.append_chunk(self.seq_number, data)
+        self.seq_number += 1
+        self.size += len(data)
+
+    def append_chunk(self, seq_number, data):
+        """Encode and store a chunk after the first one"""
+        compressed, blob = self.encode(data)
+        DataObject.append_chunk(self.uuid, blob, seq_number, compressed)
+
+    def encode(self, data):
+        """Return (compressed, blob) for the DataObject row of a chunk"""
+        if self.dedup:
+            return store_chunk(self.codec, data, self.level)
+        return encode_chunk(self.codec, data, self.level)
+
+    def wait(self, limit=0):
+        """Wait until at most limit chunk writes are in flight. If one of
+        them failed all the writes in flight are waited for and the error
+        of the first failing chunk is raised"""
+        while len(self.pending) > limit:
+            error = self.pending.popleft().exception()
+            if error is not None:
+                wait(self.pending)
+                self.pending.clear()
+                raise error
+
+    def flush(self):
+        """Write the remaining content and wait for the writes in flight"""
+        if self.buffer:
+            self.write_chunk(self.buffer)
+            self.buffer = ''
+        self.wait()
+
+    def close(self):
+        """Write the remaining content and return the uuid of the blob"""
+        self.flush()
+        self.expected = None
+        self.save()
+        return self.uuid
+
+    def checksum(self):
+        """Return the hex SHA-256 of the content written, None if it wasn't
+        all written by this writer"""
+        if self.hasher is None:
+            return None
+        return self.hasher.hexdigest()
+
+    def checkpoint(self):
+        """Save the full chunks written so far for a resumable upload and
+        return the committed size. The content of an incomplete chunk is
+        dropped, it has to be sent again. It hasn't been hashed as chunks
+        are hashed when they are written"""
+        self.buffer = ''
+        self.save()
+        return self.size
+
+    def save(self):
+        """Wait for the writes in flight and record the blob in BlobInfo"""
+        self.wait()
+        if self.uuid is None:
+            # Empty content
+            data_object = DataObject.create(None, False,
+                                            metadata=self.metadata,
+                                            create_ts=self.create_ts,
+                                            acl=self.acl)
+            self.uuid = data_object.uuid
+        sha256 = None if self.expected is not None else self.checksum()
+        BlobInfo.create(uuid=self.uuid,
+                        codec=self.codec,
+                        size=self.size,
+                        chunks=self.seq_number,
+                        expected=self.expected,
+                        dedup=self.dedup,
+                        sha256=sha256)
+        if self.expected is None and sha256 is None:
+            submit_checksum(self.uuid)
+
+    def abort(self):
+        """Delete the chunks written so far, the blob won't be used"""
+        self.buffer = ''
+        # No write may land after the rows are deleted
+        wait(self.pending)
+        self.pending.clear()
+        if self.uuid is not None:
+            if self.dedup:
+                release_rows(self.uuid)
+            DataObject.objects.filter(uuid=self.uuid).delete()
+            BlobInfo.objects.filter(uuid=self.uuid).delete()
+
+
+def staged_writer(path):
+    """Return a writer appending to the blob staged for a resource, None if
+    no upload is replacing its content"""
+    staged = StagedUpload.objects.filter(path=path).first()
+    if staged is None:
+        return None
+    return BlobWriter.resume(staged.blob)
+
+
+def stage(path, writer):
+    """Record the blob of an upload replacing the content of a resource, once
+    its first part has been saved"""
+    StagedUpload.create(path=path, blob=writer.uuid, created=datetime.utcnow())
+
+
+def unstage(path):
+    """Forget the staged upload of a resource, its blob has replaced the
+    content or has been aborted"""
+    StagedUpload.objects.filter(path=path).delete()
+
+
+def submit_checksum(uuid):
+    """Compute the checksum of a complete blob in the background"""
+    submit("checksum_blob", "{}{}".format(BLOB_SCHEME, uuid), None, uuid=uuid)
+
+
+@job("checksum_blob", status=False)
+def record_checksum(current, uuid):
+    """Record the SHA-256 of a blob which couldn't be hashed as it was
+    written"""
+    info = BlobInfo.objects.filter(uuid=uuid).first()
+    if info is None or info.sha256 or info.expected is not None:
+        return
+    hasher = hashlib.sha256()
+    for data in iter_content(uuid):
+        hasher.update(data)
+    BlobInfo.objects.filter(uuid=uuid).update(sha256=hasher.hexdigest())
+
+
+def copy_stream(stream, writer, limit=None):
+    """Give the content of a file-like object (a request for instance) to
+    a writer CHUNK_SIZE bytes at a time, at most limit bytes if given.
+    Return the number of bytes read"""
+    read = 0
+    while stream is not None and (limit is None or read < limit):
+        size = CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit - read)
+        data = stream.read(size)
+        if not data:
+            break
+        writer.write(data)
+        read += len(data)
+    return read
+
+
+def write_stream(stream, **kwargs):
+    """Write the content read from a file-like object as a new blob and
+    return the BlobWriter. kwargs are given to the BlobWriter"""
+    writer = BlobWriter(**kwargs)
+    try:
+        copy_stream(stream, writer)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    return writer
+
+
+def write_blob(content, **kwargs):
+    """Write a string as a new blob and return the BlobWriter, kwargs are
+    given to the BlobWriter"""
+    writer = BlobWriter(**kwargs)
+    writer.write(content)
+    writer.close()
+    return writer
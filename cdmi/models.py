@@ -8,7 +8,20 @@ __license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
 import mimetypes
 from collections import OrderedDict
 
-from drastic.models.collection import Collection
+from archive.blobs import (
+    blob_checksum,
+    blob_id,
+    gzip_encoding,
+    iter_content,
+    iter_range,
+    negotiate_gzip
+)
+from archive.lookup import find_collection
+from archive.tree import (
+    child_count,
+    get_children
+)
+from cdmi.streaming import StreamedValue
 
 class CDMIContainer(object):
     """Wrapper to return CDMI fields from a Drastic Collection"""
@@ -24,25 +37,37 @@ class CDMIContainer(object):
                )
 
     def get_children(self, range=None):
-        """Mandatory - Names of the children objects in the container object."""
-        child_c , child_r = self.collection.get_child()
-        child_c = [ u"{}/".format(c) for c in child_c ]
-        res = child_c + child_r
+        """Mandatory - Names of the children objects in the container object.
+        The listing is only bounded by the requested range, the counter of
+        children may be behind"""
         if range:
-            start, stop = ( int(el) for el in range.split("-", 1))
-            # map CDMI range value to python index
-            stop += 1
+            start, stop = self.parse_range(range)
+        else:
+            start, stop = 0, None
+        return get_children(self.collection, start, stop)
+
+    def parse_range(self, range):
+        """Map a CDMI range value to python indices"""
+        start, stop = ( int(el) for el in range.split("-", 1))
+        # map CDMI range value to python index
+        return start, stop + 1
+
+    def get_children_bounds(self, range=None):
+        """Map a CDMI range value to python indices, bounded by the number of
+        children"""
+        nb_child = child_count(self.collection)
+        if range:
+            start, stop = self.parse_range(range)
         else:
             start = 0
-            stop = len(res)
-        return res[start:stop]
+            stop = nb_child
+        return start, min(stop, nb_child)
 
-    def get_childrenrange(self):
+    def get_childrenrange(self, range=None):
         """Mandatory - The children of the container expressed as a range"""
-        child_container , child_dataobject = self.collection.get_child()
-        nb_child = len(child_container) + len(child_dataobject)
-        if nb_child != 0:
-            return "{}-{}".format(0, nb_child-1)
+        start, stop = self.get_children_bounds(range)
+        if stop > start:
+            return "{}-{}".format(start, stop-1)
         else:
             return "0-0"
 
@@ -82,7 +107,7 @@ class CDMIContainer(object):
         parent_path = self.collection.container
         if self.collection.is_root:
             parent_path = u"/"
-        parent = Collection.find(parent_path)
+        parent = find_collection(parent_path)
         return parent.uuid
 
     def get_parentURI(self):
@@ -117,7 +142,23 @@ class CDMIResource(object):
         self.api_root = api_root
 
     def chunk_content(self):
-        return self.resource.chunk_content()
+        return iter_content(blob_id(self.resource.url))
+
+    def negotiate_gzip(self):
+        """Return (encoding, iterator) for the whole content, see
+        archive.blobs.negotiate_gzip"""
+        return negotiate_gzip(blob_id(self.resource.url))
+
+    def gzip_encoding(self):
+        """Return the encoding negotiate_gzip sends the content with, see
+        archive.blobs.gzip_encoding"""
+        return gzip_encoding(blob_id(self.resource.url))
+
+    def chunk_range(self, start, stop):
+        """Iterate over the content between start (inclusive) and stop
+        (exclusive), only the chunks overlapping the range are fetched"""
+        return iter_range(blob_id(self.resource.url), self.resource.size,
+                          start, stop)
 
     def get_capabilitiesURI(self):
         """Mandatory URI to the capabilities for the object"""
@@ -143,6 +184,10 @@ class CDMIResource(object):
     def get_metadata(self):
         md = self.resource.get_cdmi_metadata()
         md.update(self.resource.get_acl_metadata())
+        checksum = blob_checksum(blob_id(self.resource.url))
+        if checksum:
+            # SHA-256 of the value computed when it was written
+            md["cdmi_hash"] = checksum
         return md
 
     def get_mimetype(self):
@@ -172,7 +217,7 @@ class CDMIResource(object):
     def get_parentID(self):
         """Conditional Object ID of the parent container object
         We don't support objects only accessible by ID so this is mandatory"""
-        parent = Collection.find(self.resource.container)
+        parent = find_collection(self.resource.container)
         return parent.uuid
 
     def get_parentURI(self):
@@ -205,31 +250,46 @@ class CDMIResource(object):
         return self.resource.url
 
     def get_value(self, range=None):
-        driver = get_driver(self.resource.url)
-        # TODO: Improve that for large files. Check what CDMI recommends
-        # for stream access
-        data = []
-        for chk in driver.chunk_content():
-            data.append(chk)
-        res = ''.join([s for s in data])
+        """Mandatory - The value of the data object, only the chunks covering
+        the range are read"""
+        start, stop = self.get_value_bounds(range)
+        return ''.join(self.chunk_range(start, stop))
+
+    def get_value_stream(self, range=None):
+        """The value of the data object as a StreamedValue, chunks are read and
+        encoded while the response is sent"""
+        start, stop = self.get_value_bounds(range)
+        return StreamedValue(self.chunk_range(start, stop),
+                             self.get_valuetransferencoding())
+
+    def get_value_bounds(self, range=None):
+        """Map a CDMI range value to python indices, bounded by the size of the
+        data object. Raise ValueError if the range isn't valid or starts past
+        the end of the data object"""
         if range:
             start, stop = (int(el) for el in range.split("-", 1))
             # map CDMI range value to python index
             stop += 1
+            if start < 0 or stop <= start or start >= self.resource.size:
+                raise ValueError(u"Range '{}' not satisfiable".format(range))
         else:
             start = 0
-            stop = len(res)
-        return res[start:stop]
+            stop = self.resource.size
+        return start, min(stop, self.resource.size)
 
-    def get_valuerange(self):
+    def get_valuerange(self, range=None):
         """Mandatory - The range of bytes of the data object to be returned in
         the value field"""
-        return "0-{}".format(self.resource.size-1)
+        start, stop = self.get_value_bounds(range)
+        return "{}-{}".format(start, stop-1)
 
     def get_valuetransferencoding(self):
         """Mandatory - The value transfer encoding used for the data object
         value"""
-        return "utf-8"
+        val = self.resource.get_metadata_key("cdmi_valuetransferencoding")
+        if not val:
+            val = "utf-8"
+        return val
 
     def is_reference(self):
         """Check if the resource is a reference"""
@@ -0,0 +1,74 @@
+""""CDMI streaming
+
+Serialize CDMI bodies to JSON as a stream. The metadata fields are written
+first and the value of the data object is then encoded chunk by chunk, so
+the memory used doesn't depend on the size of the object.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import base64
+import codecs
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class StreamedValue(object):
+    """Placeholder for a field whose content is produced by an iterator of
+    raw chunks, encoded with the CDMI value transfer encoding"""
+
+    def __init__(self, chunks, encoding="utf-8"):
+        self.chunks = chunks
+        self.encoding = encoding
+
+    def __iter__(self):
+        if self.encoding == "base64":
+            return iter_base64(self.chunks)
+        else:
+            return iter_utf8(self.chunks)
+
+
+def iter_base64(chunks):
+    """Encode chunks in base64, bytes are carried over to the next chunk so
+    that each piece is a multiple of 3 bytes and needs no padding"""
+    remainder = ''
+    for chk in chunks:
+        data = remainder + chk
+        cut = len(data) - len(data) % 3
+        remainder = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut])
+    if remainder:
+        yield base64.b64encode(remainder)
+
+
+def iter_utf8(chunks):
+    """Escape chunks of utf-8 content for a JSON string, a character split
+    between two chunks is decoded with the next one"""
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    for chk in chunks:
+        text = decoder.decode(chk)
+        if text:
+            # Strip the quotes around the JSON string
+            yield json.dumps(text)[1:-1]
+    text = decoder.decode('', final=True)
+    if text:
+        yield json.dumps(text)[1:-1]
+
+
+def stream_cdmi_body(body):
+    """Generate the JSON serialization of an ordered CDMI body. StreamedValue
+    fields are written as JSON strings, piece by piece"""
+    yield "{"
+    for idx, (field, value) in enumerate(body.items()):
+        prefix = "{}{}: ".format(", " if idx else "", json.dumps(field))
+        if isinstance(value, StreamedValue):
+            yield prefix + '"'
+            for piece in value:
+                yield piece
+            yield '"'
+        else:
+            yield prefix + json.dumps(value, cls=DjangoJSONEncoder)
+    yield "}"
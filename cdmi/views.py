@@ -9,12 +9,14 @@ from collections import OrderedDict
 import base64
 import mimetypes
 import hashlib
-from cStringIO import StringIO
-import zipfile
 import os
 import json
 import logging
 import ldap
+import re
+from urllib import unquote
+from urlparse import urlparse
+from uuid import uuid4
 
 from django.shortcuts import redirect
 from django.http import (
@@ -59,20 +61,70 @@ from rest_framework.permissions import IsAuthenticated
 
 from cdmi.capabilities import SYSTEM_CAPABILITIES
 from cdmi.storage import CDMIDataAccessObject
+from cdmi.streaming import stream_cdmi_body
 from cdmi.models import (
     CDMIContainer,
     CDMIResource
 )
+from archive.blobs import BLOB_SCHEME, blob_id
+from archive.conditional import (
+    add_digest,
+    add_validators,
+    gzip_passthrough,
+    not_modified,
+    set_encoding
+)
+from archive.dedup import release_blob
+from archive.lookup import (
+    find_collection,
+    find_collection_by_uuid,
+    find_resource,
+    find_resource_by_uuid,
+    forget,
+    prefetch,
+    remember
+)
+from archive.multipart import (
+    abort_session,
+    complete_session,
+    create_session,
+    get_session,
+    list_parts,
+    write_part
+)
+from archive.operations import (
+    copy_in_background,
+    copy_resource,
+    delete_collection,
+    move_resource,
+    prepare_copy,
+    replace_resource,
+    submit_copy,
+    submit_transfer
+)
+from archive.tombstone import is_buried
+from archive.tree import (
+    add_child,
+    iter_children,
+    remove_child
+)
 from archive.uploader import CassandraUploadedFile
+from archive.writer import (
+    BlobWriter,
+    copy_stream,
+    stage,
+    staged_writer,
+    unstage,
+    write_blob,
+    write_stream
+)
 from drastic.models import (
     Collection,
-    DataObject,
     Resource,
     User
 )
 from drastic.util import split
 from drastic.util_archive import (
-    path_exists,
     is_resource,
     is_collection
 )
@@ -83,9 +135,7 @@ from drastic.models.errors import (
     NoSuchResourceError,
     NoWriteAccessError,
 )
-
-
-CHUNK_SIZE = 1048576
+from users.credentials import cached_user, remember_credentials
 
 # List of supported version (In order so the first to be picked up is the most
 # recent one
@@ -165,10 +215,6 @@ def check_cdmi_version(request):
          return ""
 
 
-def chunkstring(string, length):
-    return (string[0+i:length+i] for i in range(0, len(string), length))
-
-
 # TODO: Move this to a helper
 def get_extension(name):
     _, ext = os.path.splitext(name)
@@ -201,19 +247,76 @@ def parse_range_header(specifier, len_content):
             if start < 0:
                 start = 0
             stop = len_content
+            if start >= stop:
+                return []
         else:
             # byte-range-spec: first-byte-pos "-" [last-byte-pos]
             start, stop = val.split("-", 1)
             start = int(start)
             # Add 1 to make stop exclusive (HTTP spec is inclusive)
             stop = int(stop)+1 if stop else len_content
-            if start >= stop:
+            if start >= stop or start >= len_content:
                 return []
+            # A last-byte-pos past the end of the content is truncated
+            stop = min(stop, len_content)
 
         ranges.append((start, stop))
 
     return ranges
 
+def parse_content_range(value):
+    """Parses the Content-Range header of a request, "bytes X-Y/Z" or
+    "bytes */Z". Returns (start, stop, total) with stop exclusive, start and
+    stop are None for "*". Returns None if the header is invalid"""
+    match = re.match(r"^bytes (?:(\d+)-(\d+)|\*)/(\d+)$", value.strip())
+    if not match:
+        return None
+    total = int(match.group(3))
+    if match.group(1) is None:
+        return None, None, total
+    start = int(match.group(1))
+    stop = int(match.group(2)) + 1
+    if start >= stop or stop > total:
+        return None
+    return start, stop, total
+
+
+def multipart_part_header(idx, boundary, content_type, start, stop, length):
+    """Return the delimiter and the headers of a multipart/byteranges part"""
+    # The CRLF preceding a boundary belongs to the delimiter
+    return ("{}--{}\r\n"
+            "Content-Type: {}\r\n"
+            "Content-Range: bytes {}-{}/{}\r\n"
+            "\r\n".format("\r\n" if idx else "", boundary, content_type,
+                           start, stop - 1, length))
+
+
+def multipart_byteranges(cdmi_resource, ranges, boundary):
+    """Generate a multipart/byteranges body for a list of (start, stop)
+    pairs. The content of each part is read from the chunks of the resource
+    when the part is reached"""
+    content_type = cdmi_resource.get_mimetype()
+    length = cdmi_resource.get_length()
+    for idx, (start, stop) in enumerate(ranges):
+        yield multipart_part_header(idx, boundary, content_type,
+                                    start, stop, length)
+        for data in cdmi_resource.chunk_range(start, stop):
+            yield data
+    yield "\r\n--{}--\r\n".format(boundary)
+
+
+def multipart_byteranges_length(cdmi_resource, ranges, boundary):
+    """Return the length of the body generated by multipart_byteranges"""
+    content_type = cdmi_resource.get_mimetype()
+    length = cdmi_resource.get_length()
+    total = len("\r\n--{}--\r\n".format(boundary))
+    for idx, (start, stop) in enumerate(ranges):
+        total += len(multipart_part_header(idx, boundary, content_type,
+                                           start, stop, length))
+        total += stop - start
+    return total
+
+
 def capabilities(request, path):
     """Read all fields from an existing capability object.
 
@@ -292,11 +395,15 @@ class CassandraAuthentication(BasicAuthentication):
         """
         Authenticate the username and password against username and password.
         """
+        user, generation = cached_user(username, password)
+        if user is not None:
+            return (user, None)
         user = User.find(username)
         if user is None or not user.is_active():
             raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
         if not user.authenticate(password) and not ldapAuthenticate(username, password):
             raise exceptions.AuthenticationFailed(_('Invalid username/password.'))
+        remember_credentials(user, password, generation)
         return (user, None)
 
 def ldapAuthenticate(username, password):
@@ -323,11 +430,11 @@ def ldapAuthenticate(username, password):
 def crud_id(request, id):
     # The URL should end with a '/'
     id = id.replace('/', '')
-    collection = Collection.find_by_uuid(id)
+    collection = find_collection_by_uuid(id)
     if collection:
         return redirect('cdmi:api_cdmi', path=collection.path())
     else:
-        resource = Resource.find_by_uuid(id)
+        resource = find_resource_by_uuid(id)
         if resource:
             return redirect('cdmi:api_cdmi', path=resource.path())
         else:
@@ -378,10 +485,36 @@ class CDMIView(APIView):
                 return self.read_container(path)
             else:
                 return self.read_container(path[:-1])
+        elif "uploadId" in request.GET:
+            return self.read_upload_parts(path)
         else:
             return self.read_data_object(path)
 
 
+    @csrf_exempt
+    def head(self, request, path=u'/', format=None):
+        self.user = request.user
+        # Check HTTP Headers for CDMI version or HTTP mode
+        self.cdmi_version = self.check_cdmi_version()
+        if not self.cdmi_version:
+            self.logger.warning("Unsupported CDMI version")
+            return Response(status=HTTP_400_BAD_REQUEST)
+        self.http_mode = self.cdmi_version == "HTTP"
+
+        # Add a '/' at the beginning if not present
+        if not path.startswith('/'):
+            path = u"/{}".format(path)
+        # In CDMI standard a container is defined by the / at the end
+        is_container = path.endswith('/')
+        if is_container:
+            if path == '/': # root
+                return self.head_container(path)
+            else:
+                return self.head_container(path[:-1])
+        else:
+            return self.head_data_object(path)
+
+
     @csrf_exempt
     def put(self, request, path=u'/', format=None):
         self.user = request.user
@@ -425,15 +558,20 @@ class CDMIView(APIView):
         elif is_container:
             # Delete container
             return self.delete_container(path[:-1])
+        elif "uploadId" in request.GET:
+            # Abort a multipart upload
+            return self.delete_upload(path)
         else:
             # Delete data object
             return self.delete_data_object(path)
 
 
     def delete_data_object(self, path):
-        resource = Resource.find(path)
+        # The parent is needed to update its children count
+        prefetch(collections=[split(path)[0]], resources=[path])
+        resource = find_resource(path)
         if not resource:
-            collection = Collection.find(path)
+            collection = find_collection(path)
             if collection:
                 self.logger.info(u"Fail to delete resource at '{}', test if it's a collection".format(path))
                 return self.delete_container(path)
@@ -444,26 +582,37 @@ class CDMIView(APIView):
             self.logger.warning(u"User {} tried to delete resource '{}'".format(self.user, path))
             return Response(status=HTTP_403_FORBIDDEN)
 
+        release_blob(blob_id(resource.url))
         resource.delete()
+        forget(path)
+        remove_child(find_collection(resource.container))
         self.logger.info(u"The resource '{}' was successfully deleted".format(path))
         return Response(status=HTTP_204_NO_CONTENT)
 
 
     def delete_container(self, path):
-        collection = Collection.find(path)
+        collection = find_collection(path)
         if not collection:
             self.logger.info(u"Fail to delete collection at '{}'".format(path))
             return Response(status=HTTP_404_NOT_FOUND)
         if not collection.user_can(self.user, "delete"):
             self.logger.warning(u"User {} tried to delete container '{}'".format(self.user, path))
             return Response(status=HTTP_403_FORBIDDEN)
-        Collection.delete_all(collection.path)
-        self.logger.info(u"The container '{}' was successfully deleted".format(path))
-        return Response(status=HTTP_204_NO_CONTENT)
+        # Only the first child is read, a large container isn't listed
+        if next(iter_children(collection), None) is None:
+            Collection.delete_all(collection.path)
+            forget(collection.path)
+            remove_child(find_collection(collection.container))
+            self.logger.info(u"The container '{}' was successfully deleted".format(path))
+            return Response(status=HTTP_204_NO_CONTENT)
+        # The tree disappears at once, it's deleted by a background job
+        delete_collection(collection, self.user.name)
+        self.logger.info(u"Deletion of the container '{}' started".format(path))
+        return Response(status=HTTP_202_ACCEPTED)
 
 
     def read_container(self, path):
-        collection = Collection.find(path)
+        collection = find_collection(path)
         if not collection:
             self.logger.info(u"Fail to read a collection at '{}'".format(path))
             return Response(status=HTTP_404_NOT_FOUND)
@@ -489,13 +638,19 @@ class CDMIView(APIView):
             self.logger.error(u"Accept header problem for container '{}' ('{}')".format(path, http_accepts))
             return Response(status=HTTP_406_NOT_ACCEPTABLE)
         if self.request.GET:
-            fields = {}
+            requested = {}
             for field, value in self.request.GET.items():
+                # A range may be given with the field name ("children:0-99")
+                field, _, field_range = field.partition(':')
                 if field in FIELDS_CONTAINER:
-                    fields[field] = value
+                    requested[field] = field_range or value
                 else:
                     self.logger.error(u"Parameter problem for container '{}' ('{} undefined')".format(path, field))
                     return Response(status=HTTP_406_NOT_ACCEPTABLE)
+            # Keep the order of the CDMI fields
+            fields = OrderedDict([(field, requested[field])
+                                  for field in FIELDS_CONTAINER
+                                  if field in requested])
         else:
             fields = FIELDS_CONTAINER
 
@@ -504,11 +659,10 @@ class CDMIView(APIView):
 
         for field, value in fields.items():
             get_field = getattr(cdmi_container, 'get_{}'.format(field))
-            # If we send children with a range value we need to update the
-            # childrenrange value
-            # The childrenrange should be created before the children field
-            if field == "children" and value and "childrenrange" in body:
-                body["childrenrange"] = value
+            # If we send children with a range value the childrenrange
+            # describes that range
+            if field == "childrenrange" and fields.get("children"):
+                value = fields["children"]
             try:
                 if value:
                     body[field] = get_field(value)
@@ -517,7 +671,17 @@ class CDMIView(APIView):
             except:
                 self.logger.error(u"Parameter problem for container '{}' ('{}={}')".format(path, field, value))
                 return Response(status=HTTP_406_NOT_ACCEPTABLE)
-
+        if "children" in body and "childrenrange" in body:
+            # The range of the children actually listed, the counter of
+            # children may be behind
+            start = 0
+            if fields.get("children"):
+                start = cdmi_container.parse_range(fields["children"])[0]
+            if body["children"]:
+                body["childrenrange"] = "{}-{}".format(
+                    start, start + len(body["children"]) - 1)
+            else:
+                body["childrenrange"] = "0-0"
 
         self.logger.info(u"{} reads container at '{}' using CDMI".format(self.user.name, path))
         response = JsonResponse(body,
@@ -529,9 +693,11 @@ class CDMIView(APIView):
 
     def read_data_object(self, path):
         """Read a resource"""
-        resource = Resource.find(path)
+        # The parent is needed for the parentID field
+        prefetch(collections=[split(path)[0]], resources=[path])
+        resource = find_resource(path)
         if not resource:
-            collection = Collection.find(path)
+            collection = find_collection(path)
             if collection:
                 self.logger.info(u"Fail to read a resource at '{}', test if it's a collection".format(path))
                 return self.read_container(path)
@@ -554,44 +720,51 @@ class CDMIView(APIView):
 
     def read_data_object_cdmi(self, cdmi_resource):
         path = cdmi_resource.get_path()
-        http_accepts = self.request.META.get('HTTP_ACCEPT', '').split(',')
-        http_accepts = set([el.split(";")[0] for el in http_accepts])
-        if not http_accepts.intersection(set(['application/cdmi-object', '*/*'])):
-            self.logger.error(u"Accept header problem for resource '{}' ('{}')".format(path, http_accepts))
-            return Response(status=HTTP_406_NOT_ACCEPTABLE)
+        response = self.check_cdmi_object_read(cdmi_resource)
+        if response is not None:
+            return response
 
         if cdmi_resource.is_reference():
             field_dict = FIELDS_REFERENCE
-            status = HTTP_302_FOUND
         else:
             field_dict = FIELDS_DATA_OBJECT
-            if 'value' in field_dict:
-                del field_dict['value']
-            if 'valuerange' in field_dict:
-                del field_dict['valuerange']
-            status = HTTP_200_OK
 
-        # TODO: multipart/mixed, byte ranges for value, filter metadata
+        # TODO: multipart/mixed, filter metadata
         if self.request.GET:
-            fields = {}
+            requested = {}
             for field, value in self.request.GET.items():
+                # A range may be given with the field name ("value:0-99")
+                field, _, field_range = field.partition(':')
                 if field in field_dict.keys():
-                    fields[field] = value
+                    requested[field] = field_range or value
                 else:
                     self.logger.error(u"Parameter problem for resource '{}' ('{} undefined')".format(path, field))
                     return Response(status=HTTP_406_NOT_ACCEPTABLE)
+            # Keep the order of the CDMI fields
+            fields = OrderedDict([(field, requested[field])
+                                  for field in field_dict
+                                  if field in requested])
         else:
             fields = field_dict
 
+        # The ranges are checked before the body is sent
+        for field in ("value", "valuerange"):
+            if fields.get(field):
+                try:
+                    cdmi_resource.get_value_bounds(fields[field])
+                except ValueError:
+                    self.logger.error(u"Range problem for resource '{}' ('{}={}')".format(path, field, fields[field]))
+                    return Response(status=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
         # Obtained information in a dictionary
         body = OrderedDict()
         for field, value in fields.items():
             get_field = getattr(cdmi_resource, 'get_{}'.format(field))
-            # If we ask the value with a range value we need to update the
-            # valuerange value
-            # The valuerange should be created before the value field
-            if field == "value" and value and "valuerange" in body:
-                body["valuerange"] = value
+            # If we ask the value with a range value the valuerange describes
+            # that range, it is computed from the size without reading the
+            # value
+            if field == "valuerange" and fields.get("value"):
+                value = fields["value"]
 #             try:
 #                 if value:
 #                     body[field] = get_field(value)
@@ -600,22 +773,54 @@ class CDMIView(APIView):
 #             except Exception as e:
 #                 self.logger.error("Parameter problem for resource '{}' ('{}={}')".format(path, field, value))
 #                 return Response(status=HTTP_406_NOT_ACCEPTABLE)
-            if value:
+            if field == "value":
+                # The value is read and encoded while the response is sent
+                body[field] = cdmi_resource.get_value_stream(value)
+            elif value:
                 body[field] = get_field(value)
             else:
                 body[field] = get_field()
 
         self.logger.info(u"{} reads resource at '{}' using CDMI".format(self.user.name, path))
-        response = JsonResponse(body,
-                                content_type="application/cdmi-object",
-                                status=status)
-        response["X-CDMI-Specification-Version"] = "1.1"
+        response = StreamingHttpResponse(streaming_content=stream_cdmi_body(body),
+                                         content_type="application/cdmi-object")
+        return self.cdmi_object_headers(response, cdmi_resource)
+
+
+    def check_cdmi_object_read(self, cdmi_resource):
+        """Return the response of a CDMI read which isn't answered with the
+        object (406 Not Acceptable, 304 Not Modified), None otherwise"""
+        http_accepts = self.request.META.get('HTTP_ACCEPT', '').split(',')
+        http_accepts = set([el.split(";")[0] for el in http_accepts])
+        if not http_accepts.intersection(set(['application/cdmi-object', '*/*'])):
+            self.logger.error(u"Accept header problem for resource '{}' ('{}')".format(cdmi_resource.get_path(), http_accepts))
+            return Response(status=HTTP_406_NOT_ACCEPTABLE)
+        response = not_modified(self.request, cdmi_resource.resource)
+        if response is not None:
+            add_validators(response, cdmi_resource.resource, weak=True)
         return response
 
 
+    def cdmi_object_headers(self, response, cdmi_resource):
+        """Set the status and the headers of a CDMI read of a data object,
+        shared by GET and HEAD. The body is streamed, its length isn't known
+        in advance"""
+        if cdmi_resource.is_reference():
+            response.status_code = HTTP_302_FOUND
+        response["X-CDMI-Specification-Version"] = "1.1"
+        return add_validators(response, cdmi_resource.resource, weak=True)
+
+
     def read_data_object_http(self, cdmi_resource):
         path = cdmi_resource.get_path()
-
+        # Conditional requests are answered before any chunk is read
+        response = not_modified(self.request, cdmi_resource.resource)
+        if response is not None:
+            self.logger.info(u"{} reads unmodified resource at '{}' using HTTP".format(self.user.name, path))
+            return response
+
+        # Ranges are always sent without Content-Encoding
+        encoding = None
         if self.request.META.has_key("HTTP_RANGE"):
             # Use range header
             specifier = self.request.META.get("HTTP_RANGE", "")
@@ -623,27 +828,104 @@ class CDMIView(APIView):
                                        cdmi_resource.get_length())
             if not range:
                 self.logger.error(u"Range header parsing failed '{}' for resource '{}'".format(specifier, path))
-                return Response(status=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                return Response(status=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                headers={'Content-Range': "bytes */{}".format(cdmi_resource.get_length())})
             else:
                 self.logger.info(u"{} reads resource at '{}' using HTTP, with range '{}'".format(self.user.name, path, range))
-                # Totally inefficient but that's probably not something
-                # we're gonna use a lot
-                value = cdmi_resource.get_value()
-                data = []
-                for (start, stop) in range:
-                    data.append(value[start:stop])
-                data = ''.join([d for d in data])
                 st = HTTP_206_PARTIAL_CONTENT
-            return StreamingHttpResponse(streaming_content=data,
-                                         content_type=cdmi_resource.get_mimetype(),
-                                         status=st)
+            if len(range) == 1:
+                # Only the chunks overlapping the requested range are read
+                start, stop = range[0]
+                response = StreamingHttpResponse(streaming_content=cdmi_resource.chunk_range(start, stop),
+                                                 content_type=cdmi_resource.get_mimetype(),
+                                                 status=st)
+                response["Content-Range"] = "bytes {}-{}/{}".format(
+                    start, stop - 1, cdmi_resource.get_length())
+                response["Content-Length"] = stop - start
+            else:
+                # Several ranges are sent as a multipart/byteranges body,
+                # each part is fetched when the client reaches it
+                boundary = uuid4().hex
+                data = multipart_byteranges(cdmi_resource, range, boundary)
+                response = StreamingHttpResponse(streaming_content=data,
+                                                 content_type="multipart/byteranges; boundary={}".format(boundary),
+                                                 status=st)
+                response["Content-Length"] = multipart_byteranges_length(
+                    cdmi_resource, range, boundary)
         else:
             self.logger.info(u"{} reads resource at '{}' using HTTP".format(self.user.name, path))
             content_type = cdmi_resource.get_mimetype()
             st = HTTP_200_OK
-            return StreamingHttpResponse(streaming_content=cdmi_resource.chunk_content(),
-                                         content_type=cdmi_resource.get_mimetype(),
-                                         status=st)
+            if gzip_passthrough(self.request, cdmi_resource.get_length()):
+                # Compressed chunks are sent without being inflated
+                encoding, content = cdmi_resource.negotiate_gzip()
+            else:
+                content = cdmi_resource.chunk_content()
+            response = StreamingHttpResponse(streaming_content=content,
+                                             content_type=cdmi_resource.get_mimetype(),
+                                             status=st)
+            if not encoding:
+                response["Content-Length"] = cdmi_resource.get_length()
+                add_digest(response, cdmi_resource.resource)
+            set_encoding(response, encoding)
+        response["Accept-Ranges"] = "bytes"
+        return add_validators(response, cdmi_resource.resource, encoding)
+
+    def head_container(self, path):
+        """Return the headers of a container read, no children are listed"""
+        collection = find_collection(path)
+        if not collection:
+            return Response(status=HTTP_404_NOT_FOUND)
+        if not collection.user_can(self.user, "read"):
+            self.logger.warning(u"User {} tried to read container at '{}'".format(self.user, path))
+            return Response(status=HTTP_403_FORBIDDEN)
+        if self.http_mode:
+            return Response(status=HTTP_406_NOT_ACCEPTABLE)
+        return HttpResponse(content_type="application/cdmi-container")
+
+
+    def head_data_object(self, path):
+        """Return the headers of a data object read, only the resource row is
+        fetched (and the first chunk when gzip may be negotiated)"""
+        resource = find_resource(path)
+        if not resource:
+            if find_collection(path):
+                return self.head_container(path)
+            return Response(status=HTTP_404_NOT_FOUND)
+        if not resource.user_can(self.user, "read"):
+            self.logger.warning(u"User {} tried to read resource at '{}'".format(self.user, path))
+            return Response(status=HTTP_403_FORBIDDEN)
+
+        cdmi_resource = CDMIResource(resource, self.api_root)
+        if not self.http_mode:
+            response = self.check_cdmi_object_read(cdmi_resource)
+            if response is not None:
+                return response
+            # An empty streaming response doesn't get a Content-Length of 0,
+            # as the body of the GET has no Content-Length
+            response = StreamingHttpResponse(streaming_content=[],
+                                             content_type="application/cdmi-object")
+            return self.cdmi_object_headers(response, cdmi_resource)
+        if cdmi_resource.is_reference():
+            return self.read_data_object_reference(cdmi_resource)
+        response = not_modified(self.request, resource)
+        if response is not None:
+            return response
+        # The same encoding as a GET, only the first chunk is read to decide
+        encoding = None
+        if gzip_passthrough(self.request, cdmi_resource.get_length()):
+            encoding = cdmi_resource.gzip_encoding()
+        # The length of gzip encoded content isn't known, an empty streaming
+        # response doesn't get a Content-Length of 0
+        response = StreamingHttpResponse(streaming_content=[],
+                                         content_type=cdmi_resource.get_mimetype())
+        if not encoding:
+            response["Content-Length"] = cdmi_resource.get_length()
+            add_digest(response, resource)
+        set_encoding(response, encoding)
+        response["Accept-Ranges"] = "bytes"
+        return add_validators(response, resource, encoding)
+
 
     def read_data_object_reference(self, cdmi_resource):
         return Response(status=HTTP_302_FOUND,
@@ -652,7 +934,7 @@ class CDMIView(APIView):
 
     def put_container(self, path):
         # Check if the container already exists
-        collection = Collection.find(path)
+        collection = find_collection(path)
         if collection:
             # Update
             if not collection.user_can(self.user, "edit"):
@@ -670,7 +952,10 @@ class CDMIView(APIView):
         if name.startswith("cdmi_"):
             return Response("cdmi_ prefix is not a valid name for a container",
                             status=HTTP_400_BAD_REQUEST)
-        parent_collection = Collection.find(parent)
+        if is_buried(path):
+            # The previous collection is still being deleted
+            return Response(status=HTTP_409_CONFLICT)
+        parent_collection = find_collection(parent)
         if not parent_collection:
             self.logger.info(u"Fail to create a collection at '{}', parent collection doesn't exist".format(path))
             return Response(status=HTTP_404_NOT_FOUND)
@@ -679,14 +964,26 @@ class CDMIView(APIView):
             self.logger.warning(u"User {} tried to create new collection at '{}'".format(self.user, path))
             return Response(status=HTTP_403_FORBIDDEN)
 
+        if not self.http_mode:
+            try:
+                request_body = json.loads(self.request.body or "{}")
+            except ValueError:
+                request_body = {}
+            if isinstance(request_body, dict):
+                for operation in ("copy", "move"):
+                    if operation in request_body:
+                        return self.transfer_container(parent, name, operation,
+                                                       request_body[operation])
+
         body = OrderedDict()
         try:
             collection = Collection.create(name=name,
                                            container=parent)
         except ResourceConflictError:
             return Response(status=HTTP_409_CONFLICT)
+        remember(collection)
+        add_child(parent_collection)
         cdmi_container = CDMIContainer(collection, self.api_root)
-        delayed = False
         res = self.put_container_metadata(collection)
         if res != HTTP_204_NO_CONTENT:
             return Response(status=res)
@@ -697,28 +994,20 @@ class CDMIView(APIView):
             #
             # Send the CDMI response but with Content-Type = application/json
             content_type = 'application/json'
-            # Mandatory completionStatus
-            # Does not accept CDMI - cannot return "202 Accepted"
-            # Try to wait until complete
-            while not path_exists(path):
-                # Wait for 5 seconds
-                time.sleep(5)
-            response_status = "201 Created"
+            # Mandatory completionStatus, the collection is created
+            # synchronously
+            response_status = HTTP_201_CREATED
             body['completionStatus'] = "Complete"
         else:
             # CDMI mode
             for field, value in FIELDS_CONTAINER.items():
                 get_field = getattr(cdmi_container, 'get_{}'.format(field))
                 body[field] = get_field()
-
-            if delayed:
-                response_status = HTTP_202_ACCEPTED
-                body['completionStatus'] = "Processing"
-            else:
-                response_status = HTTP_201_CREATED
-                body['completionStatus'] = "Complete"
+            content_type = body['objectType']
+            response_status = HTTP_201_CREATED
+            body['completionStatus'] = "Complete"
         return JsonResponse(body,
-                            content_type=body['objectType'],
+                            content_type=content_type,
                             status=response_status)
 
     def put_container_metadata(self, collection):
@@ -738,62 +1027,19 @@ class CDMIView(APIView):
                 del metadata["cdmi_acl"]
                 collection.update_acl_cdmi(cdmi_acl)
             collection.update(metadata=metadata)
+            forget(collection.path)
         return HTTP_204_NO_CONTENT
 
 
-    def create_data_object(self, raw_data, metadata=None, create_ts=None, acl=None):
-        if settings.COMPRESS_UPLOADS:
-            # Compress the raw_data and store that instead
-            f = StringIO()
-            z = zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED)
-            z.writestr("data", raw_data)
-            z.close()
-            data = f.getvalue()
-            f.close()
-        else:
-            data = raw_data
-        data_object = DataObject.create(data, settings.COMPRESS_UPLOADS,
-                                        metadata=metadata,create_ts=create_ts,
-                                        acl=acl)
-        return data_object.uuid
-
-
-    def create_empty_data_object(self):
-        data_object = DataObject.create(None)
-        return data_object.uuid
-
-
-    def append_data_object(self, uuid, seq_num, raw_data):
-        if settings.COMPRESS_UPLOADS:
-            # Compress the raw_data and store that instead
-            f = StringIO()
-            z = zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED)
-            z.writestr("data", raw_data)
-            z.close()
-            data = f.getvalue()
-            f.close()
-        else:
-            data = raw_data
-        DataObject.append_chunk(uuid, data, seq_num, settings.COMPRESS_UPLOADS)
-
-
-    def create_resource(self, parent, name, content, mimetype):
-        uuid = None
-        seq_num = 0
-        for chk in chunkstring(content, CHUNK_SIZE):
-            if uuid is None:
-                uuid = self.create_data_object(chk)
-            else:
-                self.append_data_object(uuid, seq_num, chk)
-            seq_num += 1
-        if uuid is None: # Content is null
-            uuid = self.create_empty_data_object()
-        url = "cassandra://{}".format(uuid)
+    def create_resource(self, parent, name, blob, mimetype):
+        """Create a resource for a blob written with a BlobWriter"""
         resource = Resource.create(name=name,
                                    container=parent,
-                                   url=url,
+                                   url=blob.url,
                                    mimetype=mimetype,
-                                   size=len(content))
+                                   size=blob.size)
+        remember(resource)
+        add_child(find_collection(parent))
         return resource
 
 
@@ -802,6 +1048,8 @@ class CDMIView(APIView):
                                    container=parent,
                                    url=url,
                                    mimetype=mimetype)
+        remember(resource)
+        add_child(find_collection(parent))
         return resource
 
 
@@ -816,37 +1064,152 @@ class CDMIView(APIView):
             return Response(status=HTTP_400_BAD_REQUEST)
         else:
             mimetype = content_type
-        content = self.request.body
+        content_range = self.request.META.get("HTTP_CONTENT_RANGE")
+        if content_range:
+            return self.put_data_object_range(parent, name, resource,
+                                              mimetype, content_range)
         if resource:
-            # Update value
-            # Delete old blobs
-            old_meta = resource.get_metadata()
-            old_acl = resource.get_acl()
-            create_ts = resource.get_create_ts()
+            blob_args = {"metadata": resource.get_metadata(),
+                         "acl": resource.get_acl(),
+                         "create_ts": resource.get_create_ts()}
+        else:
+            blob_args = {}
+        # The body is written as it's read, it's never held in memory
+        blob = write_stream(self.request.stream, mimetype=mimetype,
+                            **blob_args)
+        try:
+            expected = int(self.request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            expected = 0
+        if blob.size < expected:
+            self.logger.error(u"Incomplete body for resource '{}' ({}/{} bytes)".format(name, blob.size, expected))
+            blob.abort()
+            return Response(status=HTTP_400_BAD_REQUEST)
 
+        if resource:
+            # Update value, the old blobs are deleted once the new one is
+            # complete
+            release_blob(blob_id(resource.url))
             resource.delete_blobs()
-            uuid = None
-            seq_num = 0
-            for chk in chunkstring(content, CHUNK_SIZE):
-                if uuid is None:
-                    uuid = self.create_data_object(chk,
-                                                   metadata=old_meta,
-                                                   acl=old_acl,
-                                                   create_ts=create_ts)
-                else:
-                    self.append_data_object(uuid, seq_num, chk)
-                seq_num += 1
-            url = "cassandra://{}".format(uuid)
-
-            resource.update(url=url,
+            resource.update(url=blob.url,
+                            size=blob.size,
                             mimetype=mimetype)
+            forget(resource.path)
             return Response(status=HTTP_204_NO_CONTENT)
         else:
             # Create resource
-            self.create_resource(parent, name, content, mimetype)
+            self.create_resource(parent, name, blob, mimetype)
             return Response(status=HTTP_201_CREATED)
 
 
+    def put_data_object_range(self, parent, name, resource, mimetype,
+                              content_range):
+        """Resumable upload, each request sends a part of the content with a
+        Content-Range header. Parts are appended to the blob and the resource
+        stays in the Processing state until the last byte is received. Only
+        full chunks are committed, "bytes */total" without a body asks for
+        the committed size. An upload replacing the content of a complete
+        resource is staged in a new blob, the resource keeps its content
+        until the upload is complete"""
+        parsed = parse_content_range(content_range)
+        if not parsed:
+            self.logger.error(u"Invalid Content-Range '{}' for resource '{}'".format(content_range, name))
+            return Response(status=HTTP_400_BAD_REQUEST)
+        start, stop, total = parsed
+        writer = None
+        staged = False
+        if resource:
+            if resource.get_metadata_key("cdmi_completionStatus") == "Processing":
+                writer = BlobWriter.resume(blob_id(resource.url))
+            else:
+                writer = staged_writer(resource.path)
+                staged = True
+
+        if start is None:
+            # Status query
+            if writer is None:
+                if resource:
+                    return self.upload_status_response(resource.size, HTTP_200_OK)
+                return Response(status=HTTP_404_NOT_FOUND)
+            return self.upload_status_response(writer.size)
+
+        if start == 0:
+            # A new upload, replacing the one in progress if any
+            if writer is not None:
+                writer.abort()
+            blob_args = {}
+            if resource:
+                blob_args = {"metadata": resource.get_metadata(),
+                             "acl": resource.get_acl(),
+                             "create_ts": resource.get_create_ts()}
+            writer = BlobWriter(mimetype=mimetype, expected=total, **blob_args)
+        elif writer is None or writer.size != start or writer.expected != total:
+            self.logger.info(u"Content-Range '{}' doesn't follow the committed content of '{}'".format(content_range, name))
+            if writer is None:
+                return Response(status=HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            return self.upload_status_response(writer.size,
+                                               HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        received = copy_stream(self.request.stream, writer, stop - start)
+        if stop == total and received == stop - start:
+            writer.close()
+            committed = total
+        else:
+            # An interrupted part still commits its full chunks
+            committed = writer.checkpoint()
+
+        if staged:
+            # The resource keeps its content until the upload is complete
+            if committed < total:
+                if start == 0:
+                    stage(resource.path, writer)
+                return self.upload_status_response(committed)
+            unstage(resource.path)
+
+        if committed < total:
+            status = {"cdmi_completionStatus": "Processing",
+                      "cdmi_percentComplete": str(committed * 100 // total)}
+        else:
+            status = {"cdmi_completionStatus": "Complete",
+                      "cdmi_percentComplete": "100"}
+        if resource:
+            metadata = resource.get_metadata()
+            metadata.update(status)
+            if staged or start == 0:
+                # The resource now points to the new blob
+                release_blob(blob_id(resource.url))
+                resource.delete_blobs()
+            resource.update(url=writer.url,
+                            size=committed,
+                            mimetype=mimetype,
+                            metadata=metadata)
+            forget(resource.path)
+            created = False
+        else:
+            resource = Resource.create(name=name,
+                                       container=parent,
+                                       url=writer.url,
+                                       mimetype=mimetype,
+                                       size=committed,
+                                       metadata=status)
+            remember(resource)
+            add_child(find_collection(parent))
+            created = True
+
+        if committed < total:
+            return self.upload_status_response(committed)
+        return Response(status=HTTP_201_CREATED if created else HTTP_204_NO_CONTENT)
+
+
+    def upload_status_response(self, committed, status=HTTP_202_ACCEPTED):
+        """Response describing a resumable upload, the Range header gives
+        the committed content where the next part has to start"""
+        headers = {}
+        if committed:
+            headers["Range"] = "bytes=0-{}".format(committed - 1)
+        return Response(status=status, headers=headers)
+
+
     def put_data_object_cdmi(self, parent, name, resource):
         tmp = self.request.content_type.split("; ")
         content_type = tmp[0]
@@ -882,16 +1245,30 @@ class CDMIView(APIView):
             # Only one of these fields shall be specified in any given
             # operation.
             return Response(status=HTTP_400_BAD_REQUEST, content='Too many value_types')
-        elif value_type and not (value_type[0] in ['value', 'reference']):
-            # Only 'value' and 'reference' are supported at the present time
+        elif value_type and not (value_type[0] in ['value', 'reference', 'copy', 'move']):
+            # Only 'value', 'reference', 'copy' and 'move' are supported at
+            # the present time
             # TODO: Check the authorized fields with reference
             return Response(status=HTTP_400_BAD_REQUEST, content='Bad value type')
 
         is_reference = False    # By default
+        # Source of a copy made by a background job
+        copy_source = None
         # CDMI specification mandates that text/plain should be used
         # where mimetype is absent
         mimetype = request_body.get('mimetype', 'text/plain')
-        if value_type:
+        metadata_default = {'cdmi_mimetype': mimetype}
+        if value_type and value_type[0] in ['copy', 'move']:
+            resource, copy_source, error = self.transfer_data_object(
+                parent, name, resource, value_type[0],
+                request_body[value_type[0]])
+            if error:
+                return error
+            is_reference = resource.is_reference
+            # The metadata of the source is kept unless new one is given
+            metadata = resource.get_metadata()
+            metadata_default = {}
+        elif value_type:
             if value_type[0] == 'value':
                 content = request_body.get(value_type[0])
                 encoding = request_body.get('valuetransferencoding', 'utf-8')
@@ -904,17 +1281,21 @@ class CDMIView(APIView):
                     return Response(status=HTTP_400_BAD_REQUEST, content='Unknown encoding')
                 metadata['cdmi_valuetransferencoding'] = encoding
                 if resource:
-                    # Update value
-                    # TODO: Delete old blob
-                    blob = self.create_blob(name, content)
-                    blob_id = blob.uuid
-                    url = "cassandra://{}".format(blob_id)
-                    resource.update(url=url,
-                                    size=len(content),
+                    # Update value, the old blobs are deleted once the new
+                    # one is written
+                    blob = write_blob(content, mimetype=mimetype,
+                                      metadata=resource.get_metadata(),
+                                      acl=resource.get_acl(),
+                                      create_ts=resource.get_create_ts())
+                    release_blob(blob_id(resource.url))
+                    resource.delete_blobs()
+                    resource.update(url=blob.url,
+                                    size=blob.size,
                                     mimetype=mimetype)
                 else:
                     # Create resource
-                    resource = self.create_resource(parent, name, content, mimetype)
+                    blob = write_blob(content, mimetype=mimetype)
+                    resource = self.create_resource(parent, name, blob, mimetype)
             elif value_type[0] == 'reference':
                 is_reference = True
                 if resource:
@@ -928,7 +1309,7 @@ class CDMIView(APIView):
 
         cdmi_resource = CDMIResource(resource, self.api_root)
         # Assemble metadata
-        metadata_body = request_body.get("metadata", {'cdmi_mimetype': mimetype})
+        metadata_body = request_body.get("metadata", metadata_default)
         if "cdmi_acl" in metadata_body:
             # We treat acl metadata in a specific way
             cdmi_acl = metadata_body["cdmi_acl"]
@@ -936,6 +1317,12 @@ class CDMIView(APIView):
             resource.update_acl_cdmi(cdmi_acl)
         metadata.update(metadata_body)
         resource.update(metadata=metadata)
+        forget(resource.path)
+        if copy_source is not None:
+            # The job starts once the metadata it copies is set
+            submit_copy(resource, copy_source, self.user.name)
+            resource = find_resource(resource.path)
+            cdmi_resource = CDMIResource(resource, self.api_root)
 
         if cdmi_resource.is_reference():
             field_dict = FIELDS_REFERENCE
@@ -953,6 +1340,9 @@ class CDMIView(APIView):
             try:
                 if field in ["value", "valuerange"] and is_reference:
                     continue
+                if field == "value":
+                    # Don't read back the content that has just been written
+                    continue
                 body[field] = get_field()
             except Exception as e:
                 self.logger.error(u"Parameter problem for resource '{}' ('{}={}')".format(cdmi_resource.get_path(), field, value))
@@ -960,40 +1350,254 @@ class CDMIView(APIView):
 
         return JsonResponse(body,
                             content_type='application/cdmi-object',
-                            status=HTTP_201_CREATED)
+                            status=HTTP_202_ACCEPTED if copy_source else HTTP_201_CREATED)
 
 
 
     def put_data_object(self, path):
+        parent, name = split(path)
+        # These lookups are independent, issue them together
+        prefetch(collections=[path, parent], resources=[path])
         # Check if a collection with the name exists
-        collection = Collection.find(path)
+        collection = find_collection(path)
         if collection:
             # Try to put a data_object when a collection of the same name
             # already exists
             self.logger.info(u"Impossible to create a new resource, the collection '{}' already exists, try to update it".format(path))
             return self.put_container(path)
 
-        parent, name = split(path)
+        resource, error = self.check_data_object_write(path)
+        if error:
+            return error
+        # All permissions are checked, we can proceed to create/update
+        if "uploadId" in self.request.GET:
+            return self.put_upload_part(path)
+        if self.http_mode:
+            return self.put_data_object_http(parent, name, resource)
+        else:
+            return self.put_data_object_cdmi(parent, name, resource)
+
+
+    def check_data_object_write(self, path):
+        """Check that the user can create or modify the resource at path.
+        Return (resource, None), resource is None if it doesn't exist yet,
+        or (None, error response)"""
+        parent, _ = split(path)
         # Check if the resource already exists
-        resource = Resource.find(path)
+        resource = find_resource(path)
         # Check permissions
         if resource:
             # Update Resource
             if not resource.user_can(self.user, "edit"):
                 self.logger.warning(u"User {} tried to modify resource at '{}'".format(self.user, path))
-                return Response(status=HTTP_403_FORBIDDEN)
+                return None, Response(status=HTTP_403_FORBIDDEN)
         else:
             # Create Resource
-            parent_collection = Collection.find(parent)
+            parent_collection = find_collection(parent)
             if not parent_collection:
                 self.logger.info(u"Fail to create a resource at '{}', collection doesn't exist".format(path))
-                return Response(status=HTTP_404_NOT_FOUND)
+                return None, Response(status=HTTP_404_NOT_FOUND)
             # Check if user can create a new resource in the collection
             if not parent_collection.user_can(self.user, "write"):
                 self.logger.warning(u"User {} tried to create new resource at '{}'".format(self.user, path))
-                return Response(status=HTTP_403_FORBIDDEN)
-        # All permissions are checked, we can proceed to create/update
-        if self.http_mode:
-            return self.put_data_object_http(parent, name, resource)
+                return None, Response(status=HTTP_403_FORBIDDEN)
+        return resource, None
+
+
+    @csrf_exempt
+    def post(self, request, path=u'/', format=None):
+        """Multipart uploads, "?uploads" starts an upload and
+        "?uploadId=<id>" completes it"""
+        self.user = request.user
+        if not path.startswith('/'):
+            path = u"/{}".format(path)
+        if path.endswith('/'):
+            return Response(status=HTTP_400_BAD_REQUEST)
+        prefetch(collections=[path, split(path)[0]], resources=[path])
+        if find_collection(path):
+            return Response(status=HTTP_409_CONFLICT)
+        resource, error = self.check_data_object_write(path)
+        if error:
+            return error
+        if "uploads" in request.GET:
+            return self.create_upload(path, resource)
+        elif "uploadId" in request.GET:
+            return self.complete_upload(path, resource)
+        return Response(status=HTTP_400_BAD_REQUEST)
+
+
+    def get_upload(self, path):
+        """Return the multipart upload given in the query string, None if
+        it isn't an upload of this user for this path"""
+        session = get_session(self.request.GET["uploadId"])
+        if (session is None or session.path != path or
+                session.owner != self.user.name):
+            return None
+        return session
+
+
+    def create_upload(self, path, resource):
+        mimetype = self.request.content_type.split("; ")[0]
+        if not mimetype or mimetype == "application/cdmi-object":
+            mimetype = "application/octet-stream"
+        if resource:
+            # The new blob keeps what drastic stores in the first row
+            blob_args = {"metadata": resource.get_metadata(),
+                         "acl": resource.get_acl(),
+                         "create_ts": resource.get_create_ts()}
         else:
-            return self.put_data_object_cdmi(parent, name, resource)
+            blob_args = {}
+        try:
+            part_size = int(self.request.GET.get("partSize") or 0)
+            session = create_session(path, self.user.name, mimetype,
+                                     part_size, **blob_args)
+        except ValueError as e:
+            self.logger.info(u"Invalid multipart upload for '{}': {}".format(path, e))
+            return Response(status=HTTP_400_BAD_REQUEST)
+        return JsonResponse({"uploadId": session.id,
+                             "partSize": session.part_size},
+                            status=HTTP_201_CREATED)
+
+
+    def put_upload_part(self, path):
+        session = self.get_upload(path)
+        if session is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+        try:
+            number = int(self.request.GET.get("partNumber", ""))
+            write_part(session, number, self.request.stream)
+        except ValueError as e:
+            self.logger.info(u"Invalid part for the upload of '{}': {}".format(path, e))
+            return Response(status=HTTP_400_BAD_REQUEST)
+        return Response(status=HTTP_204_NO_CONTENT)
+
+
+    def read_upload_parts(self, path):
+        session = self.get_upload(path)
+        if session is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+        parts = [{"partNumber": part.number, "size": part.size}
+                 for part in list_parts(session)]
+        return JsonResponse({"uploadId": session.id,
+                             "partSize": session.part_size,
+                             "parts": parts})
+
+
+    def complete_upload(self, path, resource):
+        """The parts already are in place in the blob of the upload, the
+        resource only has to point to it"""
+        session = self.get_upload(path)
+        if session is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+        try:
+            uuid, size = complete_session(session)
+        except ValueError as e:
+            self.logger.info(u"Fail to complete the upload of '{}': {}".format(path, e))
+            return Response(status=HTTP_400_BAD_REQUEST)
+        url = "{}{}".format(BLOB_SCHEME, uuid)
+        if resource:
+            release_blob(blob_id(resource.url))
+            resource.delete_blobs()
+            resource.update(url=url, size=size, mimetype=session.mimetype)
+            forget(resource.path)
+            return Response(status=HTTP_204_NO_CONTENT)
+        parent, name = split(path)
+        resource = Resource.create(name=name,
+                                   container=parent,
+                                   url=url,
+                                   mimetype=session.mimetype,
+                                   size=size)
+        remember(resource)
+        add_child(find_collection(parent))
+        return Response(status=HTTP_201_CREATED)
+
+
+    def delete_upload(self, path):
+        session = self.get_upload(path)
+        if session is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+        abort_session(session)
+        return Response(status=HTTP_204_NO_CONTENT)
+
+
+    def source_path(self, uri):
+        """Return the path of the object given by the URI of a copy or move
+        field, either a full URI or a path below the CDMI endpoint"""
+        path = unquote(urlparse(uri).path)
+        prefix = urlparse(self.api_root).path.rstrip('/')
+        if prefix and path.startswith(prefix + '/'):
+            path = path[len(prefix):]
+        if not path.startswith('/'):
+            path = u"/{}".format(path)
+        return path
+
+
+    def transfer_data_object(self, parent, name, resource, operation, uri):
+        """Copy or move the data object given by uri to parent/name, an
+        existing resource at the destination is replaced. Return
+        (resource, copy source, None) or (None, None, error response). The
+        copy source is given when the content has to be copied by a
+        background job, it's submitted once the destination is ready"""
+        source = find_resource(self.source_path(uri))
+        if not source:
+            return None, None, Response(status=HTTP_400_BAD_REQUEST,
+                                        content='Unknown source object')
+        permission = "read" if operation == "copy" else "delete"
+        if not source.user_can(self.user, permission):
+            self.logger.warning(u"User {} tried to {} resource at '{}'".format(self.user, operation, source.path))
+            return None, None, Response(status=HTTP_403_FORBIDDEN)
+        if resource and resource.path == source.path:
+            return None, None, Response(status=HTTP_409_CONFLICT)
+        if operation == "copy" and copy_in_background(source):
+            try:
+                resource = prepare_copy(source, parent, name, resource,
+                                        self.user.name)
+            except ResourceConflictError:
+                return None, None, Response(status=HTTP_409_CONFLICT)
+            self.logger.info(u"Copy of resource '{}' to '{}' started".format(source.path, resource.path))
+            return resource, source, None
+        if resource:
+            # The destination keeps its content until the copy is written
+            resource = replace_resource(resource, source,
+                                        move=(operation == "move"))
+        else:
+            transfer = copy_resource if operation == "copy" else move_resource
+            try:
+                resource = transfer(source, parent, name, self.user.name)
+            except ResourceConflictError:
+                return None, None, Response(status=HTTP_409_CONFLICT)
+        self.logger.info(u"Resource '{}' {} to '{}'".format(source.path, "copied" if operation == "copy" else "moved", resource.path))
+        return resource, None, None
+
+
+    def transfer_container(self, parent, name, operation, uri):
+        """Copy or move the container given by uri and everything below it
+        to parent/name. The children are copied or moved by a background
+        job, the new container is returned at once with 202 Accepted and
+        stays Processing until the job is done"""
+        source = find_collection(self.source_path(uri).rstrip('/') or '/')
+        if not source:
+            return Response(status=HTTP_400_BAD_REQUEST,
+                            content='Unknown source container')
+        permission = "read" if operation == "copy" else "delete"
+        if not source.user_can(self.user, permission):
+            self.logger.warning(u"User {} tried to {} container at '{}'".format(self.user, operation, source.path))
+            return Response(status=HTTP_403_FORBIDDEN)
+        try:
+            collection = submit_transfer(operation, source, parent, name,
+                                         self.user.name)
+        except ValueError as e:
+            return Response(status=HTTP_400_BAD_REQUEST, content=str(e))
+        except (CollectionConflictError, ResourceConflictError):
+            return Response(status=HTTP_409_CONFLICT)
+        self.logger.info(u"Container '{}' {} to '{}' started".format(source.path, "copy" if operation == "copy" else "move", collection.path))
+        cdmi_container = CDMIContainer(collection, self.api_root)
+        body = OrderedDict()
+        for field, value in FIELDS_CONTAINER.items():
+            get_field = getattr(cdmi_container, 'get_{}'.format(field))
+            body[field] = get_field()
+        body['completionStatus'] = "Processing"
+        return JsonResponse(body,
+                            content_type=body['objectType'],
+                            status=HTTP_202_ACCEPTED)
+
@@ -13,12 +13,18 @@ class DrasticAppConfig(AppConfig):
     verbose_name = "Drastic"
 
     def ready(self):
+        from cassandra.cqlengine.management import sync_table
         from drastic.models import connect, Collection
+        from archive.models import TABLES
 
         cfg = get_config(None)
         connect(keyspace=cfg.get('KEYSPACE', 'drastic'),
                    hosts=cfg.get('CASSANDRA_HOSTS', ('127.0.0.1', )))
 
+        # Tables used by the web application on top of drastic ones
+        for table in TABLES:
+            sync_table(table)
+
         #  root = Collection.find("/")
         if False:  # not root:
             print "Creating root collection"
@@ -66,6 +66,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     #'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'archive.middleware.LookupMiddleware',
     'users.middleware.CassandraAuth',
     'cdmi.middleware.CDMIMiddleware'
 )
@@ -131,12 +132,6 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATIC_ROOT = os.getenv('DJANGO_STATIC_ROOT', STATIC_ROOT)
 
-# Try and load a local, machine specific settings if it exists.
-try:
-    from local_settings import *
-except:
-    pass
-
 ##############################################################################
 # Caching
 ##############################################################################
@@ -146,11 +141,67 @@ CACHES = {
     }
 }
 
+# Collections and resources kept across requests by each worker (see
+# archive.lookup). Invalidations are exchanged through the default cache,
+# the lookup cache is only enabled when that cache is shared by the workers
+# (memcached for instance).
+LOOKUP_CACHE_SIZE = 10000
+LOOKUP_CACHE_TTL = 300
+
 
 COMPRESS_UPLOADS = True
+# Codec used for the chunks of new blobs when COMPRESS_UPLOADS is set, see
+# archive.chunk_codecs ("zip", "gzip", "bz2", and "lzma", "lz4" or "zstd" if
+# their module is installed). drastic, its agents and its command line
+# client only decode "zip", only choose another codec if the keyspace isn't
+# read by them. Run "manage.py benchmark_codecs" to compare them.
+CHUNK_CODEC = "zip"
+# Compression level, None for the default level of the codec
+CHUNK_CODEC_LEVEL = None
+# Chunks of an upload encoded and written while the next ones are received
+# (0 to write them one at a time), and threads shared by all the uploads of
+# a worker
+BLOB_WRITE_WINDOW = 4
+BLOB_WRITE_THREADS = 8
+# Store each distinct chunk once, blobs then hold references to chunks
+# keyed by the SHA-256 of their content, see archive.dedup
+CHUNK_DEDUP = False
+# Compressed chunks are sent to clients accepting gzip without being
+# inflated. Objects larger than a chunk become a stream of several gzip
+# members, which is valid gzip but some decoders (urllib3 < 1.24 for
+# instance) only read the first member.
+GZIP_MULTI_MEMBER = False
+# Bytes read per second by "manage.py audit_fixity", 0 for no limit
+FIXITY_BYTES_PER_SECOND = 10 * 1048576
+# Seconds a blob has to stay unreferenced before "manage.py collect_blobs"
+# deletes it, uploads not yet attached to a resource are younger than that
+BLOB_GC_GRACE_PERIOD = 24 * 3600
+# Threads of each worker running background jobs (recursive copies, moves
+# and deletes), see archive.jobs
+JOB_THREADS = 2
+# Data objects of this size (in bytes) or larger are copied by a background
+# job, the copy is answered with 202 Accepted
+BACKGROUND_COPY_SIZE = 64 * 1048576
+# Objects deleted per second by a background recursive delete, 0 for no
+# limit
+DELETE_OBJECTS_PER_SECOND = 200
+# Seconds a worker keeps the list of collections being deleted before
+# reading it again
+TOMBSTONE_REFRESH = 5
+# Seconds verified HTTP Basic credentials are kept in the default cache,
+# see users.credentials. 0 disables the cache, it's also disabled when the
+# default cache isn't shared by the workers (LocMemCache)
+CREDENTIALS_CACHE_TTL = 0
 DATA_UPLOAD_MAX_MEMORY_SIZE = None
 
 
+# Try and load a local, machine specific settings if it exists.
+try:
+    from local_settings import *
+except:
+    pass
+
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
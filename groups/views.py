@@ -16,6 +16,8 @@ from drastic.models import (
     User
 )
 
+from users.credentials import invalidate_credentials
+
 
 @login_required
 def add_user(request, name):
@@ -32,6 +34,8 @@ def add_user(request, name):
             data = form.cleaned_data
             new_users = data.get('users', [])
             added, not_added, already_there = group.add_users(new_users)
+            for uname in added:
+                invalidate_credentials(uname)
             if added:
                 msg = "{} has been added to the group '{}'".format(", ".join(added),
                                                                    group.name)
@@ -174,6 +178,8 @@ def rm_user(request, name, uname):
         raise PermissionDenied
     if user and group:
         removed, not_there, not_exist = group.rm_user(uname)
+        if removed:
+            invalidate_credentials(uname)
         if removed:
             msg = "'{}' has been removed from the group '{}'".format(uname,
                                                                    name)
@@ -8,6 +8,7 @@ comment prints the section number in parentheses after the message.
 from functools import partial
 import json
 import logging
+import time
 
 import shortuuid
 
@@ -331,3 +332,148 @@ def delete_a_container_object_using_cdmi_content_type():
 
         _assert(response.status_code == 204,
                 u'Expected HTTP status code {0} got {1} (9.6.7)'.format(204, response.status_code))
+
+
+def test_copy_a_container_object_in_background():
+    """Tests the copy of a container with a child object, run by a background job.
+
+    :command: ``PUT /<new container name>/`` with ``{"copy": "/<container name>/"}``
+
+    :asserts:
+        * HTTP status code == 202 |sect| `CDMI_9.2.8`_
+        * CDMI completionStatus == 'Processing', then 'Complete' once the job is done
+        * The child object is found in the copy
+    """
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-container'
+    conf['headers']['Content-Type'] = 'application/cdmi-container'
+    container_name = shortuuid.uuid() + '/'
+    copy_name = shortuuid.uuid() + '/'
+    base_url = '{0}/{1}/'.format(conf['host'], conf['object-container'])
+
+    with object_context(container_name, utils.session, conf) as create_response, assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                u'Expected HTTP status code {0} got {1} (9.2.8)'.format(201, create_response.status_code))
+
+        response = utils.session.put(base_url + container_name + 'child.txt',
+                                     headers={'Content-Type': 'text/plain'},
+                                     data='child')
+        log_request(response)
+
+        source = '/{0}/{1}'.format(conf['object-container'], container_name)
+        response = utils.session.put(base_url + copy_name, headers=conf['headers'],
+                                     data=json.dumps({'copy': source}))
+        log_request(response)
+        try:
+            _assert(response.status_code == 202,
+                    u'Expected HTTP status code {0} got {1}'.format(202, response.status_code))
+            _assert(response.json()['completionStatus'] == 'Processing',
+                    u'Expected CDMI completionStatus "Processing" got "{0}"'.format(
+                        response.json()['completionStatus']))
+
+            for _ in range(30):
+                response = utils.session.get(base_url + copy_name, headers=conf['headers'])
+                if response.json()['completionStatus'] != 'Processing':
+                    break
+                time.sleep(1)
+            log_request(response)
+            _assert(response.json()['completionStatus'] == 'Complete',
+                    u'Expected CDMI completionStatus "Complete" got "{0}"'.format(
+                        response.json()['completionStatus']))
+
+            response = utils.session.get(base_url + copy_name + 'child.txt')
+            _assert(response.status_code == 200,
+                    u'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+        finally:
+            utils.session.delete(base_url + copy_name, headers=conf['headers'])
+
+
+def test_delete_a_container_with_children_in_background():
+    """Tests the deletion of a container with a child object, run by a background job.
+
+    :command: ``DELETE /<container_name>/``
+
+    :asserts:
+        * HTTP status code == 202
+        * The container and its child can't be read as soon as the request returns
+    """
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-container'
+    conf['headers']['Content-Type'] = 'application/cdmi-container'
+    container_name = shortuuid.uuid() + '/'
+    base_url = '{0}/{1}/'.format(conf['host'], conf['object-container'])
+
+    with assert_context() as _assert:
+        response = utils.session.put(base_url + container_name, headers=conf['headers'])
+        log_request(response)
+        _assert(response.status_code == 201,
+                u'Expected HTTP status code {0} got {1} (9.2.8)'.format(201, response.status_code))
+        response = utils.session.put(base_url + container_name + 'child.txt',
+                                     headers={'Content-Type': 'text/plain'},
+                                     data='child')
+        log_request(response)
+
+        response = utils.session.delete(base_url + container_name, headers=conf['headers'])
+        log_request(response)
+        _assert(response.status_code == 202,
+                u'Expected HTTP status code {0} got {1}'.format(202, response.status_code))
+
+        response = utils.session.get(base_url + container_name, headers=conf['headers'])
+        _assert(response.status_code == 404,
+                u'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+        response = utils.session.get(base_url + container_name + 'child.txt')
+        _assert(response.status_code == 404,
+                u'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+
+
+def test_read_container_children_by_page():
+    """Tests paging through the children of a container with more than one page of children.
+
+    :command: ``GET /<container_name>/?children:0-99;childrenrange``
+
+    :asserts:
+        * Each page lists the children of its range and childrenrange describes it
+        * The childrenrange of the container covers all the children, it doesn't drift between reads
+    """
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-container'
+    conf['headers']['Content-Type'] = 'application/cdmi-container'
+    container_name = shortuuid.uuid() + '/'
+    base_url = '{0}/{1}/'.format(conf['host'], conf['object-container'])
+    nb_children = 120
+
+    with object_context(container_name, utils.session, conf) as create_response, assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                u'Expected HTTP status code {0} got {1} (9.2.8)'.format(201, create_response.status_code))
+        try:
+            for idx in range(nb_children):
+                response = utils.session.put(base_url + container_name + 'child{0}.txt'.format(idx),
+                                             headers={'Content-Type': 'text/plain'},
+                                             data='child')
+                _assert(response.status_code == 201,
+                        u'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            children = []
+            for start, expected in ((0, '0-99'), (100, '100-119')):
+                response = utils.session.get(base_url + container_name, headers=conf['headers'],
+                                             params={'children:{0}-{1}'.format(start, start + 99): '',
+                                                     'childrenrange': ''})
+                log_request(response)
+                body = response.json()
+                _assert(body['childrenrange'] == expected,
+                        u'Expected CDMI childrenrange "{0}" got "{1}"'.format(expected, body['childrenrange']))
+                children.extend(body['children'])
+
+            _assert(sorted(children) == sorted('child{0}.txt'.format(idx) for idx in range(nb_children)),
+                    u'Expected the pages to list every child once')
+
+            for _ in range(2):
+                response = utils.session.get(base_url + container_name, headers=conf['headers'],
+                                             params={'childrenrange': ''})
+                log_request(response)
+                childrenrange = response.json()['childrenrange']
+                _assert(childrenrange == '0-{0}'.format(nb_children - 1),
+                        u'Expected CDMI childrenrange "0-{0}" got "{1}"'.format(nb_children - 1, childrenrange))
+        finally:
+            for idx in range(nb_children):
+                utils.session.delete(base_url + container_name + 'child{0}.txt'.format(idx))
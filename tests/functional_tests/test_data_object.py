@@ -10,6 +10,7 @@ import logging
 from base64 import b64encode, b64decode
 import json
 import binascii
+import hashlib
 import shortuuid
 
 from . import utils
@@ -1087,3 +1088,576 @@ def test_read_range():
         _assert(value == sample_text[19:38],
                 'Returned data is not what was expected.\n'
                 'Expected: "{0}"\nGot: "{1}"'.format(sample_text[19:38], value))
+
+
+def test_read_range_past_end():
+    """Tests that a range starting past the end of a file is not satisfiable."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        past_end = len(sample_text) + 100
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers=conf['headers'],
+                                     params={'value:{0}-{1}'.format(past_end, past_end + 99): ''})
+
+        log_request(response)
+
+        _assert(response.status_code == 416,
+                'Expected HTTP status code {0} got {1}'.format(416, response.status_code))
+
+
+def test_read_non_cdmi_range():
+    """Tests returning a range of a file using the HTTP Range header."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers={'Range': 'bytes=19-37'})
+
+        log_request(response)
+
+        _assert(response.status_code == 206,
+                'Expected HTTP status code {0} got {1}'.format(206, response.status_code))
+        expected_range = 'bytes 19-37/{0}'.format(len(sample_text))
+        _assert(response.headers.get('Content-Range') == expected_range,
+                'Expected HTTP Content-Range "{0}" got "{1}"'.format(expected_range,
+                                                                    response.headers.get('Content-Range')))
+        _assert(response.text == sample_text[19:38],
+                'Returned data is not what was expected.\n'
+                'Expected: "{0}"\nGot: "{1}"'.format(sample_text[19:38], response.text))
+
+        # A range past the end of the object can't be satisfied
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers={'Range': 'bytes={0}-'.format(len(sample_text))})
+
+        log_request(response)
+
+        _assert(response.status_code == 416,
+                'Expected HTTP status code {0} got {1}'.format(416, response.status_code))
+
+
+def test_read_non_cdmi_multiple_ranges():
+    """Tests returning several ranges of a file as a multipart/byteranges body."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers={'Range': 'bytes=0-9,19-37'})
+
+        log_request(response)
+
+        _assert(response.status_code == 206,
+                'Expected HTTP status code {0} got {1}'.format(206, response.status_code))
+        content_type = response.headers.get('Content-Type', '')
+        _assert(content_type.startswith('multipart/byteranges; boundary='),
+                'Expected HTTP Content-Type "multipart/byteranges" got "{0}"'.format(content_type))
+
+        boundary = content_type.split('boundary=', 1)[1]
+        parts = response.content.split('--{0}'.format(boundary))
+        # Preamble, two parts and the closing delimiter
+        _assert(len(parts) == 4, 'Expected 2 parts got {0}'.format(len(parts) - 2))
+        for part, (start, stop) in zip(parts[1:3], [(0, 10), (19, 38)]):
+            headers, data = part.split('\r\n\r\n', 1)
+            expected_range = 'Content-Range: bytes {0}-{1}/{2}'.format(start, stop - 1, len(sample_text))
+            _assert(expected_range in headers,
+                    'Expected "{0}" in part headers got "{1}"'.format(expected_range, headers))
+            _assert(data[:-2] == sample_text[start:stop],
+                    'Returned data is not what was expected.\n'
+                    'Expected: "{0}"\nGot: "{1}"'.format(sample_text[start:stop], data[:-2]))
+
+
+def test_read_non_cdmi_conditional():
+    """Tests that an unmodified file is answered with 304 Not Modified."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+        response = utils.session.get(url)
+
+        log_request(response)
+
+        etag = response.headers.get('ETag')
+        _assert(etag is not None, 'Expected HTTP ETag header')
+        _assert(response.headers.get('Last-Modified') is not None, 'Expected HTTP Last-Modified header')
+
+        response = utils.session.get(url, headers={'If-None-Match': etag})
+
+        log_request(response)
+
+        _assert(response.status_code == 304,
+                'Expected HTTP status code {0} got {1}'.format(304, response.status_code))
+        _assert(response.content == '', 'Expected an empty body got "{0}"'.format(response.content))
+
+
+def test_head_non_cdmi():
+    """Tests that HEAD returns the size of a file without its content."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        response = utils.session.head('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name))
+
+        log_request(response)
+
+        _assert(response.status_code == 200,
+                'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+        length = response.headers.get('Content-Length')
+        _assert(length == str(len(sample_text)),
+                'Expected HTTP Content-Length "{0}" got "{1}"'.format(len(sample_text), length))
+        _assert(response.headers.get('Accept-Ranges') == 'bytes',
+                'Expected HTTP Accept-Ranges "bytes" got "{0}"'.format(response.headers.get('Accept-Ranges')))
+        _assert(response.content == '', 'Expected an empty body got "{0}"'.format(response.content))
+
+
+def test_head_cdmi():
+    """Tests that HEAD in CDMI mode returns the headers of a CDMI read."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+        response = utils.session.get(url, headers=conf['headers'])
+
+        log_request(response)
+
+        response_head = utils.session.head(url, headers=conf['headers'])
+
+        log_request(response_head)
+
+        _assert(response_head.status_code == response.status_code,
+                'Expected HTTP status code {0} got {1}'.format(response.status_code, response_head.status_code))
+        for header in ('Content-Type', 'X-CDMI-Specification-Version', 'ETag', 'Last-Modified'):
+            _assert(response_head.headers.get(header) == response.headers.get(header),
+                    'Expected HTTP {0} "{1}" got "{2}"'.format(header, response.headers.get(header),
+                                                               response_head.headers.get(header)))
+        _assert(response_head.headers.get('ETag'), 'Expected an HTTP ETag')
+        _assert(response_head.content == '', 'Expected an empty body got "{0}"'.format(response_head.content))
+
+
+def test_read_non_cdmi_gzip():
+    """Tests that compressed chunks are sent gzip encoded when accepted."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers={'Accept-Encoding': 'gzip'})
+
+        log_request(response)
+
+        _assert(response.status_code == 200,
+                'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+        _assert('Accept-Encoding' in response.headers.get('Vary', ''),
+                'Expected HTTP Vary "Accept-Encoding" got "{0}"'.format(response.headers.get('Vary')))
+        _assert(response.content == sample_text,
+                'Returned data is not what was expected.\n'
+                'Expected: "{0}"\nGot: "{1}"'.format(sample_text, response.content))
+
+
+def test_head_non_cdmi_gzip():
+    """Tests that HEAD negotiates gzip like GET does."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+        response = utils.session.get(url, headers={'Accept-Encoding': 'gzip'}, stream=True)
+
+        log_request(response)
+
+        response_head = utils.session.head(url, headers={'Accept-Encoding': 'gzip'})
+
+        log_request(response_head)
+
+        for header in ('Content-Encoding', 'Content-Length', 'ETag', 'Vary'):
+            _assert(response_head.headers.get(header) == response.headers.get(header),
+                    'Expected HTTP {0} "{1}" got "{2}"'.format(header, response.headers.get(header),
+                                                               response_head.headers.get(header)))
+        response.close()
+
+
+def test_create_non_cdmi_resumable():
+    """Tests an upload sent in two parts with Content-Range headers."""
+    conf = get_config('CDMI')
+    conf['headers']['Content-Type'] = 'text/plain'
+    del conf['headers']['X-CDMI-Specification-Version']
+    file_name = shortuuid.uuid() + '.txt'
+    url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+    # The first part has to fill a chunk to be committed
+    chunk_size = 1048576
+    content = (sample_text * (chunk_size // len(sample_text) + 2))[:chunk_size + 100]
+    total = len(content)
+
+    with assert_context() as _assert:
+        try:
+            headers = dict(conf['headers'])
+            headers['Content-Range'] = 'bytes 0-{0}/{1}'.format(chunk_size - 1, total)
+            response = utils.session.put(url, headers=headers, data=content[:chunk_size])
+
+            log_request(response)
+
+            _assert(response.status_code == 202,
+                    'Expected HTTP status code {0} got {1}'.format(202, response.status_code))
+            expected_range = 'bytes=0-{0}'.format(chunk_size - 1)
+            _assert(response.headers.get('Range') == expected_range,
+                    'Expected HTTP Range "{0}" got "{1}"'.format(expected_range, response.headers.get('Range')))
+
+            # Ask where to resume
+            headers['Content-Range'] = 'bytes */{0}'.format(total)
+            response = utils.session.put(url, headers=headers)
+
+            log_request(response)
+
+            _assert(response.headers.get('Range') == expected_range,
+                    'Expected HTTP Range "{0}" got "{1}"'.format(expected_range, response.headers.get('Range')))
+
+            headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(chunk_size, total - 1, total)
+            response = utils.session.put(url, headers=headers, data=content[chunk_size:])
+
+            log_request(response)
+
+            _assert(response.status_code == 204,
+                    'Expected HTTP status code {0} got {1}'.format(204, response.status_code))
+
+            response = utils.session.get(url)
+
+            log_request(response)
+
+            _assert(response.content == content, 'Returned data is not what was expected.')
+        finally:
+            utils.session.delete(url, headers=conf['headers'])
+
+
+def test_create_non_cdmi_multipart():
+    """Tests a multipart upload with parts sent out of order."""
+    conf = get_config('CDMI')
+    conf['headers']['Content-Type'] = 'text/plain'
+    del conf['headers']['X-CDMI-Specification-Version']
+    file_name = shortuuid.uuid() + '.txt'
+    url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+    part_size = 1048576
+    content = (sample_text * (part_size // len(sample_text) + 2))[:part_size + 100]
+
+    with assert_context() as _assert:
+        try:
+            response = utils.session.post(url + '?uploads&partSize={0}'.format(part_size),
+                                          headers=conf['headers'])
+
+            log_request(response)
+
+            _assert(response.status_code == 201,
+                    'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+            upload_id = response.json()['uploadId']
+
+            response = utils.session.put(url + '?uploadId={0}&partNumber=2'.format(upload_id),
+                                         headers=conf['headers'], data=content[part_size:])
+
+            log_request(response)
+
+            _assert(response.status_code == 204,
+                    'Expected HTTP status code {0} got {1}'.format(204, response.status_code))
+
+            response = utils.session.put(url + '?uploadId={0}&partNumber=1'.format(upload_id),
+                                         headers=conf['headers'], data=content[:part_size])
+
+            log_request(response)
+
+            _assert(response.status_code == 204,
+                    'Expected HTTP status code {0} got {1}'.format(204, response.status_code))
+
+            response = utils.session.post(url + '?uploadId={0}'.format(upload_id),
+                                          headers=conf['headers'])
+
+            log_request(response)
+
+            _assert(response.status_code == 201,
+                    'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            response = utils.session.get(url)
+
+            log_request(response)
+
+            _assert(response.content == content, 'Returned data is not what was expected.')
+        finally:
+            utils.session.delete(url, headers=conf['headers'])
+
+
+def test_complete_non_cdmi_multipart_without_parts():
+    """Tests that completing a multipart upload without any part is refused."""
+    conf = get_config('CDMI')
+    conf['headers']['Content-Type'] = 'text/plain'
+    del conf['headers']['X-CDMI-Specification-Version']
+    file_name = shortuuid.uuid() + '.txt'
+    url = '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name)
+
+    with assert_context() as _assert:
+        response = utils.session.post(url + '?uploads', headers=conf['headers'])
+
+        log_request(response)
+
+        _assert(response.status_code == 201,
+                'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+        upload_id = response.json()['uploadId']
+
+        try:
+            response = utils.session.post(url + '?uploadId={0}'.format(upload_id),
+                                          headers=conf['headers'])
+
+            log_request(response)
+
+            _assert(response.status_code == 400,
+                    'Expected HTTP status code {0} got {1}'.format(400, response.status_code))
+
+            response = utils.session.get(url)
+
+            log_request(response)
+
+            _assert(response.status_code == 404,
+                    'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+        finally:
+            utils.session.delete(url + '?uploadId={0}'.format(upload_id), headers=conf['headers'])
+
+
+def test_read_digest():
+    """Tests that the checksum computed at ingest is returned on reads."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+    digest = hashlib.sha256(sample_text).digest()
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        response = utils.session.head('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name))
+
+        log_request(response)
+
+        expected = 'SHA-256={0}'.format(b64encode(digest))
+        _assert(response.headers.get('Digest') == expected,
+                'Expected HTTP Digest "{0}" got "{1}"'.format(expected, response.headers.get('Digest')))
+
+        response = utils.session.get('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers=conf['headers'])
+
+        log_request(response)
+
+        checksum = response.json()['metadata'].get('cdmi_hash')
+        _assert(checksum == binascii.hexlify(digest),
+                'Expected cdmi_hash "{0}" got "{1}"'.format(binascii.hexlify(digest), checksum))
+
+
+
+def test_copy_and_move_cdmi():
+    """Tests that objects are copied and moved on the server."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    copy_name = shortuuid.uuid() + '.txt'
+    moved_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+    base_url = '{0}/{1}'.format(conf['host'], conf['object-container'])
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+        try:
+            source = '/{0}/{1}'.format(conf['object-container'], file_name)
+            response = utils.session.put('{0}/{1}'.format(base_url, copy_name), headers=conf['headers'],
+                                         data=json.dumps({'copy': source}))
+
+            log_request(response)
+
+            _assert(response.status_code == 201,
+                    'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            response = utils.session.put('{0}/{1}'.format(base_url, moved_name), headers=conf['headers'],
+                                         data=json.dumps({'move': '/{0}/{1}'.format(conf['object-container'],
+                                                                                    copy_name)}))
+
+            log_request(response)
+
+            _assert(response.status_code == 201,
+                    'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            response = utils.session.get('{0}/{1}'.format(base_url, copy_name))
+            _assert(response.status_code == 404,
+                    'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+
+            for name in (file_name, moved_name):
+                response = utils.session.get('{0}/{1}'.format(base_url, name))
+
+                log_request(response)
+
+                _assert(response.content == sample_text, 'Returned data is not what was expected.')
+        finally:
+            utils.session.delete('{0}/{1}'.format(base_url, copy_name), headers=conf['headers'])
+            utils.session.delete('{0}/{1}'.format(base_url, moved_name), headers=conf['headers'])
+
+
+def test_update_acl_read_by_id():
+    """Tests that an ACL edited through the path of an object is read back through its object ID."""
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-object'
+    conf['headers']['Content-Type'] = 'application/cdmi-object'
+    file_name = shortuuid.uuid() + '.txt'
+    params = {
+        'mimetype': 'text/plain',
+        'metadata': {},
+        'valuetransferencoding': 'base64',
+        'value': b64encode(sample_text)
+    }
+    ace = {
+        'identifier': 'AUTHENTICATED@',
+        'acetype': 'ALLOW',
+        'aceflags': 'NO_FLAGS',
+        'acemask': 'READ_OBJECT'
+    }
+
+    with object_context(file_name, utils.session, conf, json.dumps(params)) as create_response, \
+            assert_context() as _assert:
+        _assert(create_response.status_code == 201,
+                'Expected HTTP status code {0} got {1} (8.3.7)'.format(201, create_response.status_code))
+
+        object_id = create_response.json()['objectID']
+        id_url = '{0}/cdmi_objectid/{1}'.format(conf['host'], object_id)
+
+        # Read the object by ID first so that it's cached
+        response = utils.session.get(id_url, headers=conf['headers'])
+
+        log_request(response)
+
+        _assert(response.status_code == 200,
+                'Expected HTTP status code {0} got {1} (8.4.7)'.format(200, response.status_code))
+
+        response = utils.session.put('{0}/{1}/{2}'.format(conf['host'], conf['object-container'], file_name),
+                                     headers=conf['headers'],
+                                     data=json.dumps({'metadata': {'cdmi_acl': [ace]}}))
+
+        log_request(response)
+
+        _assert(response.status_code in (200, 204),
+                'Expected HTTP status code 200 or 204 got {0} (8.6.7)'.format(response.status_code))
+
+        response = utils.session.get(id_url, headers=conf['headers'], params={'metadata': ''})
+
+        log_request(response)
+
+        identifiers = [el.get('identifier') for el in response.json()['metadata'].get('cdmi_acl', [])]
+        _assert(ace['identifier'] in identifiers,
+                'Expected ACE identifier "{0}" in CDMI cdmi_acl got "{1}"'.format(ace['identifier'], identifiers))
@@ -1,3 +1,7 @@
+import json
+
+import shortuuid
+
 from . import utils
 from .utils import log_request, assert_context, get_config, role_context
 
@@ -133,3 +137,60 @@ def test_read_user():
 
 def test_add_user_to_role():
     pass
+
+
+def test_password_change_rejects_old_credentials():
+    """Tests that the credentials of a user are refused once their password has been changed, even if they were
+    verified just before."""
+    conf = get_config('admin')
+    admin_auth = (conf['username'], conf['password'])
+    user_name = 'test_runner_' + shortuuid.uuid()
+    old_password = shortuuid.uuid()
+    new_password = shortuuid.uuid()
+
+    with assert_context() as _assert:
+        response = utils.session.post('{0}/users'.format(conf['host']), headers=conf['headers'], auth=admin_auth,
+                                      data=json.dumps({'username': user_name,
+                                                       'password': old_password,
+                                                       'email': user_name + '@example.com'}))
+
+        log_request(response)
+
+        _assert(response.status_code == 201,
+                u'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+        try:
+            # Verified, and cached if the credential cache is enabled
+            response = utils.session.get('{0}/authenticate'.format(conf['host']), headers=conf['headers'],
+                                         auth=(user_name, old_password))
+
+            log_request(response)
+
+            _assert(response.status_code == 200,
+                    u'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+
+            response = utils.session.put('{0}/users/{1}'.format(conf['host'], user_name), headers=conf['headers'],
+                                         auth=admin_auth, data=json.dumps({'password': new_password}))
+
+            log_request(response)
+
+            _assert(response.status_code == 200,
+                    u'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+
+            response = utils.session.get('{0}/authenticate'.format(conf['host']), headers=conf['headers'],
+                                         auth=(user_name, old_password))
+
+            log_request(response)
+
+            _assert(response.status_code in (401, 403),
+                    u'Expected HTTP status code 401 or 403 got {0}'.format(response.status_code))
+
+            response = utils.session.get('{0}/authenticate'.format(conf['host']), headers=conf['headers'],
+                                         auth=(user_name, new_password))
+
+            log_request(response)
+
+            _assert(response.status_code == 200,
+                    u'Expected HTTP status code {0} got {1}'.format(200, response.status_code))
+        finally:
+            utils.session.delete('{0}/users/{1}'.format(conf['host'], user_name), headers=conf['headers'],
+                                 auth=admin_auth)
@@ -0,0 +1,144 @@
+"""Tests the server-side copy and move of the WebDAV interface.
+
+The objects are created and read through the CDMI interface, the WebDAV requests only copy or move them.
+"""
+import shortuuid
+
+from . import utils
+from .utils import log_request, assert_context, get_config
+
+
+sample_text = u'Sample text for the WebDAV copy and move tests'
+
+
+def setup_module():
+    conf = get_config('CDMI')
+    conf['headers']['Accept'] = 'application/cdmi-container'
+    conf['headers']['Content-Type'] = 'application/cdmi-container'
+    response = utils.session.put('{0}/{1}/'.format(conf['host'], conf['object-container']), headers=conf['headers'])
+    log_request(response)
+
+
+def teardown_module():
+    conf = get_config('CDMI')
+    response = utils.session.delete('{0}/{1}/'.format(conf['host'], conf['object-container']), headers=conf['headers'])
+    log_request(response)
+
+
+def _cdmi_url(name):
+    conf = get_config('CDMI')
+    return '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], name)
+
+
+def _dav_url(name):
+    conf = get_config('WebDAV')
+    return '{0}/{1}/{2}'.format(conf['host'], conf['object-container'], name)
+
+
+def _put_object(name):
+    response = utils.session.put(_cdmi_url(name), headers={'Content-Type': 'text/plain'}, data=sample_text)
+    log_request(response)
+    return response
+
+
+def test_copy_object():
+    """Tests a COPY of an object, the source is kept and the copy has the same content.
+
+    :command: ``COPY /<object name>`` with ``Destination: /<copy name>``
+
+    :asserts:
+        * HTTP status code == 201
+        * The content of the copy and of the source are the sample text
+    """
+    conf = get_config('WebDAV')
+    name = shortuuid.uuid() + '.txt'
+    copy_name = shortuuid.uuid() + '.txt'
+
+    with assert_context() as _assert:
+        _put_object(name)
+        try:
+            headers = dict(conf['headers'], Destination=_dav_url(copy_name))
+            response = utils.session.request('COPY', _dav_url(name), headers=headers)
+            log_request(response)
+            _assert(response.status_code == 201,
+                    u'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            for path in (name, copy_name):
+                response = utils.session.get(_cdmi_url(path))
+                _assert(response.content == sample_text,
+                        u'Unexpected content for "{0}"'.format(path))
+        finally:
+            utils.session.delete(_cdmi_url(name))
+            utils.session.delete(_cdmi_url(copy_name))
+
+
+def test_move_object():
+    """Tests a MOVE of an object, the source is gone and the destination has its content.
+
+    :command: ``MOVE /<object name>`` with ``Destination: /<new name>``
+
+    :asserts:
+        * HTTP status code == 201
+        * The source doesn't exist anymore
+        * The content of the destination is the sample text
+    """
+    conf = get_config('WebDAV')
+    name = shortuuid.uuid() + '.txt'
+    new_name = shortuuid.uuid() + '.txt'
+
+    with assert_context() as _assert:
+        _put_object(name)
+        try:
+            headers = dict(conf['headers'], Destination=_dav_url(new_name))
+            response = utils.session.request('MOVE', _dav_url(name), headers=headers)
+            log_request(response)
+            _assert(response.status_code == 201,
+                    u'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            response = utils.session.get(_cdmi_url(name))
+            _assert(response.status_code == 404,
+                    u'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+            response = utils.session.get(_cdmi_url(new_name))
+            _assert(response.content == sample_text,
+                    u'Unexpected content for "{0}"'.format(new_name))
+        finally:
+            utils.session.delete(_cdmi_url(name))
+            utils.session.delete(_cdmi_url(new_name))
+
+
+def test_move_collection():
+    """Tests a MOVE of a collection with a child object.
+
+    :command: ``MOVE /<collection name>/`` with ``Destination: /<new name>/``
+
+    :asserts:
+        * HTTP status code == 201
+        * The source collection doesn't exist anymore
+        * The child object is found below the destination with its content
+    """
+    conf = get_config('WebDAV')
+    cdmi_conf = get_config('CDMI')
+    cdmi_conf['headers']['Content-Type'] = 'application/cdmi-container'
+    name = shortuuid.uuid() + '/'
+    new_name = shortuuid.uuid() + '/'
+
+    with assert_context() as _assert:
+        response = utils.session.put(_cdmi_url(name), headers=cdmi_conf['headers'])
+        log_request(response)
+        _put_object(name + 'child.txt')
+        try:
+            headers = dict(conf['headers'], Destination=_dav_url(new_name))
+            response = utils.session.request('MOVE', _dav_url(name), headers=headers)
+            log_request(response)
+            _assert(response.status_code == 201,
+                    u'Expected HTTP status code {0} got {1}'.format(201, response.status_code))
+
+            response = utils.session.get(_cdmi_url(name), headers=cdmi_conf['headers'])
+            _assert(response.status_code == 404,
+                    u'Expected HTTP status code {0} got {1}'.format(404, response.status_code))
+            response = utils.session.get(_cdmi_url(new_name + 'child.txt'))
+            _assert(response.content == sample_text,
+                    u'Unexpected content for "{0}child.txt"'.format(new_name))
+        finally:
+            utils.session.delete(_cdmi_url(name), headers=cdmi_conf['headers'])
+            utils.session.delete(_cdmi_url(new_name), headers=cdmi_conf['headers'])
@@ -0,0 +1,105 @@
+"""Credential cache
+
+HTTP Basic authentication sends the password with every request, checking
+it means reading the user from Cassandra and computing the password hash
+(or binding to LDAP). Credentials which have been verified are kept in the
+default cache for CREDENTIALS_CACHE_TTL seconds with the user they belong
+to, repeated requests from a client get the user back without either. The
+cache is only used when the default cache is shared by the workers (not
+LocMemCache), otherwise a worker wouldn't see the invalidations made by the
+others.
+
+The cache key is an HMAC of the username and the password keyed by
+SECRET_KEY, the password is never stored. Failed attempts aren't cached.
+Each user has a generation number in the cache, invalidate_credentials
+increments it when the user is modified, deactivated or deleted, which
+discards every entry cached for that user. The entry is stored with the
+generation cached_user read before the credentials were verified, so an
+invalidation made during the verification discards it as well.
+Generations are stored without expiry. One that has been evicted anyway
+is a cache miss and starts again from a random value, so the entries
+cached with the evicted generation never match it.
+Modifications made outside of the web application are seen once the
+entries expire.
+"""
+__copyright__ = "Copyright (C) 2016 University of Maryland"
+__license__ = "GNU AFFERO GENERAL PUBLIC LICENSE, Version 3"
+
+
+import hashlib
+import hmac
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CREDENTIALS_KEY = "credentials_{}"
+GENERATION_KEY = "credentials_gen_{}"
+
+
+def _keys(username, password):
+    digest = hmac.new(settings.SECRET_KEY.encode("utf-8"),
+                      u"{}\x00{}".format(username, password).encode("utf-8"),
+                      hashlib.sha256).hexdigest()
+    return CREDENTIALS_KEY.format(digest), GENERATION_KEY.format(username)
+
+
+def _ttl():
+    """Return the lifetime of the cached credentials, 0 if they aren't
+    cached"""
+    ttl = getattr(settings, "CREDENTIALS_CACHE_TTL", 0)
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith("LocMemCache"):
+        return 0
+    return ttl
+
+
+def _new_generation(gen_key):
+    """Create the generation of a user unless it exists and return it"""
+    cache.add(gen_key, random.getrandbits(48), None)
+    return cache.get(gen_key)
+
+
+def cached_user(username, password):
+    """Return (user, generation), user is None if the credentials haven't
+    been verified recently. generation has to be given to
+    remember_credentials once they are"""
+    if not _ttl():
+        return None, None
+    key, gen_key = _keys(username, password)
+    values = cache.get_many([key, gen_key])
+    generation = values.get(gen_key)
+    if generation is None:
+        # Missing or evicted, the entries can't be trusted
+        return None, _new_generation(gen_key)
+    entry = values.get(key)
+    if entry is None:
+        return None, generation
+    cached_generation, user = entry
+    if cached_generation != generation or user.name != username:
+        return None, generation
+    return user, generation
+
+
+def remember_credentials(user, password, generation):
+    """Cache credentials which have just been verified, generation is the
+    one returned by cached_user before they were"""
+    ttl = _ttl()
+    if not ttl or generation is None:
+        return
+    key, _ = _keys(user.name, password)
+    cache.set(key, (generation, user), ttl)
+
+
+def invalidate_credentials(username):
+    """Discard the cached credentials and the cached user of a user"""
+    gen_key = GENERATION_KEY.format(username)
+    _new_generation(gen_key)
+    try:
+        cache.incr(gen_key)
+    except ValueError:
+        # Evicted in between
+        cache.set(gen_key, random.getrandbits(48), None)
+    # Cached by users.middleware for the web interface
+    cache.delete("user_{}".format(username))
@@ -12,6 +12,7 @@ from drastic.models import (
 )
 import ldap
 
+from users.credentials import invalidate_credentials
 from users.forms import UserForm
 
 def notify_agent(user_id, event=""):
@@ -107,6 +108,7 @@ def delete_user(request, name):
 
     if request.method == "POST":
         user.delete(username=request.user.name)
+        invalidate_credentials(user.name)
         messages.add_message(request, messages.INFO,
                              "The user '{}' has been deleted".format(user.name))
         return redirect('users:home')
@@ -139,6 +141,7 @@ def edit_user(request, name):
             if data["password"] != user.password:
                 user.update(password=data["password"],
                             username=request.user.name)
+            invalidate_credentials(user.name)
             return redirect('users:home')
     else:
         initial_data = {'username': user.name,
@@ -3,17 +3,26 @@ from datetime import datetime
 
 from djangodav.fs.resources import BaseFSDavResource
 from djangodav.utils import url_join
-from drastic.models import Collection, Resource, DataObject
+from drastic.models import Collection, Resource
+from drastic.util import split
+
+from archive.blobs import blob_id, iter_content
+from archive.conditional import resource_etag
+from archive.dedup import release_blob
+from archive.lookup import (
+    find_collection,
+    find_resource,
+    forget,
+    remember
+)
+from archive.operations import copy_resource, move_collection, move_resource
+from archive.tree import add_child, iter_children, remove_child
+from archive.writer import write_stream
 
 import logging
 
 
 logging.warn('WEBDAV has been loaded')
-CHUNK_SIZE = 1048576
-
-
-def chunkstring(string, length):
-    return (string[0+i:length+i] for i in range(0, len(string), length))
 
 
 class DrasticDavResource(BaseFSDavResource):
@@ -26,13 +35,13 @@ class DrasticDavResource(BaseFSDavResource):
             return self.node
 
         try:
-            self.node = Collection.find(self.get_abs_path())
+            self.node = find_collection(self.get_abs_path())
         except Exception:
             logging.exception('Cannot fetch drastic collection for {}'.format(self.path))
 
         if self.node is None:
             try:
-                self.node = Resource.find(self.get_abs_path())
+                self.node = find_resource(self.get_abs_path())
             except Exception:
                 logging.exception("Cannot find drastic file resource for {}"
                                   .format(self.path))
@@ -94,20 +103,21 @@ class DrasticDavResource(BaseFSDavResource):
 
     @property
     def getetag(self):
-        return self.me().uuid
+        if self.is_collection:
+            return self.me().uuid
+        # Changes whenever the content is rewritten
+        return resource_etag(self.me())
 
     def get_children(self):
         """Return an iterator of all direct children of this resource."""
         if self.is_collection:
-            child_c, child_r = self.me().get_child()
-            child_c = [u"{}/".format(c) for c in child_c]
-            child_c.extend(child_r)
-            for child in child_c:
+            # Containers names end with a '/'
+            for child in iter_children(self.me()):
                 yield self.clone(url_join(*(self.path + [child])))
 
     def read(self):
         data = []
-        for chk in self.me().chunk_content():
+        for chk in iter_content(blob_id(self.me().url)):
             data.append(chk)
         return data
 
@@ -117,7 +127,6 @@ class DrasticDavResource(BaseFSDavResource):
         # TODO Can be optimized with Cassandra LWT
 
         # Check if the resource already exists
-        content = request.body
         # md5sum = md5(content).hexdigest()
         mimetype = "application/octet-stream"
         logging.warn(str(dir(request)))
@@ -125,7 +134,7 @@ class DrasticDavResource(BaseFSDavResource):
             tmp = request.content_type.split("; ")
             mimetype = tmp[0]
 
-        resource = Resource.find(self.get_abs_path())
+        resource = find_resource(self.get_abs_path())
         if resource:
             # NOTE For now WEBDAV updates are not supported.
             # TODO WEBDAV updates were resulting in empty files. Compare with CDMIResource
@@ -136,44 +145,37 @@ class DrasticDavResource(BaseFSDavResource):
             old_acl = resource.get_acl()
             create_ts = resource.get_create_ts()
 
+            release_blob(blob_id(resource.url))
             resource.delete_blobs()
-            uuid = None
-            seq_num = 0
-            for chk in chunkstring(content, CHUNK_SIZE):
-                if uuid is None:
-                    uuid = DataObject.create(chk,
-                                             metadata=old_meta,
-                                             acl=old_acl,
-                                             create_ts=create_ts).uuid
-                else:
-                    DataObject.append_chunk(uuid, chk, seq_num, False)
-                seq_num += 1
-            url = "cassandra://{}".format(uuid)
-            resource.update(url=url,
+            blob = write_stream(request,
+                                metadata=old_meta,
+                                acl=old_acl,
+                                create_ts=create_ts,
+                                mimetype=mimetype)
+            resource.update(url=blob.url,
+                            size=blob.size,
                             mimetype=mimetype)
+            forget(resource.path)
         else:  # Create resource
-            uuid = None
-            seq_num = 0
-            create_ts = datetime.now()
-            for chk in chunkstring(content, CHUNK_SIZE):
-                if uuid is None:
-                    uuid = DataObject.create(chk, False,
-                                             create_ts=create_ts).uuid
-                else:
-                    DataObject.append_chunk(uuid, chk, seq_num, False)
-                seq_num += 1
-            if uuid is None:  # Content is null
-                uuid = self.create_empty_data_object()
-            url = "cassandra://{}".format(uuid)
+            # The body is written as it's read, it's never held in memory
+            blob = write_stream(request, create_ts=datetime.now(),
+                                mimetype=mimetype)
             resource = Resource.create(name=self.displayname,
                                        container=self.get_parent_path()[:-1],
-                                       url=url,
+                                       url=blob.url,
                                        mimetype=mimetype,
-                                       size=len(content))
+                                       size=blob.size)
+            remember(resource)
+            add_child(find_collection(resource.container))
 
     def delete(self):
         """Delete the resource, recursive is implied."""
-        self.me().delete()
+        node = self.me()
+        if self.is_object:
+            release_blob(blob_id(node.url))
+        node.delete()
+        forget(node.path)
+        remove_child(find_collection(node.container))
 
     def create_collection(self):
         """Create a directory in the location of this resource."""
@@ -183,10 +185,22 @@ class DrasticDavResource(BaseFSDavResource):
             container = '/'
         else:
             container = self.get_parent_path()[:-1]
-        Collection.create(name=self.displayname, container=container)
+        remember(Collection.create(name=self.displayname, container=container))
+        add_child(find_collection(container))
 
     def copy_object(self, destination, depth=0):
-        raise NotImplementedError
+        """Copy the resource on the server, the chunks are copied as they
+        are stored"""
+        parent, name = split(destination.get_abs_path())
+        copy_resource(self.me(), parent, name)
 
     def move_object(self, destination):
-        raise NotImplementedError
+        """Move the resource, only its tree entry is rewritten"""
+        parent, name = split(destination.get_abs_path())
+        move_resource(self.me(), parent, name)
+
+    def move_collection(self, destination):
+        """Move the collection and everything below it without copying any
+        content"""
+        parent, name = split(destination.get_abs_path())
+        move_collection(self.me(), parent, name)
@@ -11,6 +11,9 @@ from drastic.models import (
     User,
     Collection
 )
+from archive.conditional import not_modified
+from archive.lookup import find_collection
+from users.credentials import cached_user, remember_credentials
 import ldap
 import logging
 
@@ -29,7 +32,7 @@ class DrasticDavView(RestAuthViewMixIn, DavView):
                 container = '/'
             else:
                 container = resource.get_parent_path()[:-1]
-            parent_collection = Collection.find(container)
+            parent_collection = find_collection(container)
             if parent_collection.user_can(user, "write"):
                 acl = FullAcl(read=False, write=True, delete=False)
             else:
@@ -44,6 +47,15 @@ class DrasticDavView(RestAuthViewMixIn, DavView):
         # return self.acl_class(read=True, full=False)  Old permissive code
         return acl
 
+    def get(self, request, path, head=False, *args, **kwargs):
+        # Answer conditional requests before the content is read
+        if (self.resource.exists and self.resource.is_object and
+                self.has_access(self.resource, 'read')):
+            response = not_modified(request, self.resource.me())
+            if response is not None:
+                return response
+        return super(DrasticDavView, self).get(request, path, head, *args, **kwargs)
+
 
 class CassandraAuthentication(BasicAuthentication):
     www_authenticate_realm = 'Drastic'
@@ -52,11 +64,15 @@ class CassandraAuthentication(BasicAuthentication):
         """
         Authenticate the username and password against username and password.
         """
+        user, generation = cached_user(username, password)
+        if user is not None:
+            return (user, None)
         user = User.find(username)
         if user is None or not user.is_active():
             raise exceptions.AuthenticationFailed('User inactive or deleted.')
         if not user.authenticate(password) and not ldapAuthenticate(username, password):
             raise exceptions.AuthenticationFailed('Invalid username/password.')
+        remember_credentials(user, password, generation)
         return (user, None)
 
 